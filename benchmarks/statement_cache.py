@@ -0,0 +1,77 @@
+"""
+Per-call overhead of the hot service lookups: legacy ``db.query`` chains against the
+prebuilt statements in src/services.py. Every call uses a fresh session, like a page request.
+
+    python -m benchmarks.statement_cache --calls 5000
+"""
+import argparse
+import time
+from typing import Callable, Dict
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.database import _create_engine, statement_cache
+from src.migrations import migrate
+from src.models import Beverage, User
+from src.services import create_beverage, get_user, get_user_by_email, hash_password
+
+
+def legacy_get_user(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def legacy_get_user_by_email(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+
+def legacy_get_beverage(db: Session, beverage_id: int):
+    return db.query(Beverage).filter(Beverage.id == beverage_id).first()
+
+
+def get_beverage(db: Session, beverage_id: int):
+    return db.get(Beverage, beverage_id)
+
+
+def per_call_microseconds(factory: sessionmaker, lookup: Callable[[Session, int], object], calls: int, keys: list) -> float:
+    started = time.perf_counter()
+    for n in range(calls):
+        with factory() as db:
+            lookup(db, keys[n % len(keys)])
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = _create_engine("sqlite:///:memory:")
+    migrate(engine)
+    factory = sessionmaker(bind=engine)
+    password = hash_password("benchmark")
+    with factory() as db:
+        db.add_all(User(email=f"user{n}@example.com", hashed_password=password) for n in range(args.users))
+        db.commit()
+        beverage_ids = [create_beverage(db, f"Beverage {n}", 1.5, 100).id for n in range(20)]
+    user_ids = list(range(1, args.users + 1))
+    emails = [f"user{n}@example.com" for n in range(args.users)]
+
+    cases: Dict[str, tuple] = {
+        "get_user": (legacy_get_user, get_user, user_ids),
+        "get_user_by_email": (legacy_get_user_by_email, get_user_by_email, emails),
+        "beverage lookup": (legacy_get_beverage, get_beverage, beverage_ids),
+    }
+    print(f"{'lookup':<20}{'legacy µs':>12}{'cached µs':>12}{'speedup':>10}")
+    for name, (legacy, current, keys) in cases.items():
+        # warm up both variants so the compiled-statement cache is populated
+        per_call_microseconds(factory, legacy, 100, keys)
+        per_call_microseconds(factory, current, 100, keys)
+        before = per_call_microseconds(factory, legacy, args.calls, keys)
+        after = per_call_microseconds(factory, current, args.calls, keys)
+        print(f"{name:<20}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+    print("statement cache:", statement_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# src/admin.py
+# Admin-only views, imported on first use so numpy and the forecast stay out of the app startup
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from nicegui import ui
+from nicegui.events import UploadEventArguments
+from sqlalchemy.orm import Session
+
+from src.bankimport import decode_statement, import_bank_statement
+from src.components.form import email, form, min_value, numeric, required
+from src.forecast import StockForecast, forecast_stock
+from src.logs import log_action
+from src.models import Transaction, TransactionStatus, TransactionType
+from src.projections import (
+    BeverageRow,
+    TransactionRow,
+    UserRow,
+    list_beverage_rows,
+    list_user_rows,
+    pending_transaction_rows,
+)
+from src.services import (
+    confirm_transaction,
+    create_beverage,
+    create_user,
+    search_transactions,
+    update_beverage,
+    update_user_balance,
+)
+
+logger = logging.getLogger("matekasse")
+
+LEDGER_PAGE_SIZE = 50
+
+
+def render_user_row(db: Session, u: UserRow) -> None:
+    """Render a row for a user in the admin user management section."""
+    with ui.row():
+        ui.label(f"{u.email} ")
+        ui.label(f"Balance: {u.balance_text} ")
+        ui.label(f"Admin: {u.is_admin}")
+
+        def make_balance_handler(user_id):
+            def set_balance():
+                def submit_balance(new_balance):
+                    try:
+                        with log_action(logger, "set_balance", page="/admin", user_id=user_id):
+                            update_user_balance(db, user_id, float(new_balance))
+                        ui.notify("Balance updated")
+                        ui.navigate.to("/admin")
+                    except Exception:
+                        ui.notify("Error updating balance", color="negative")
+
+                rules = {"new_balance": [required(), numeric()]}
+                with form(on_submit=submit_balance, rules=rules) as f:
+                    ui.input("New balance").props("key=new_balance type=number").mark(
+                        "Neues Guthaben"
+                    )
+                    f.create_submit_button("Save", icon="save").mark("Speichern")
+
+            return set_balance
+
+        ui.button("Edit balance", on_click=make_balance_handler(u.id)).mark(
+            "Guthaben ändern"
+        )
+        ui.button(
+            "History", on_click=lambda: ui.navigate.to(f"/admin/ledger?user_id={u.id}")
+        ).mark("Historie")
+
+
+def render_create_user_form(db: Session) -> None:
+    """Render the form for admins to create a new user."""
+    def handle_create_user(email, password, is_admin):
+        fields = {"page": "/admin", "action": "create_user"}
+        try:
+            with log_action(logger, "create_user", page="/admin"):
+                create_user(db, email, password, bool(is_admin))
+            logger.info("Admin created user %s (admin=%s)", email, is_admin, extra=fields)
+            ui.notify("User created")
+        except Exception as e:
+            logger.error("Error creating user %s: %s", email, e, extra=fields)
+            ui.notify(str(e), color="negative")
+
+    rules = {"email": [required(), email()], "password": [required()]}
+    with form(on_submit=handle_create_user, rules=rules) as f:
+        ui.input("E-Mail").props("key=email type=email").mark("E-Mail")
+        ui.input("Password", password=True).props("key=password type=password").mark(
+            "Passwort"
+        )
+        ui.checkbox("Admin").props("key=is_admin").mark("Admin-Checkbox")
+        f.create_submit_button("Create user", icon="person_add").mark("Nutzer anlegen")
+
+
+def format_forecast(forecast: Optional[StockForecast]) -> str:
+    """Describe when a beverage runs out and how much to reorder."""
+    if forecast is None or forecast.days_until_empty is None:
+        return "No recent sales"
+    text = f"Empty in ~{forecast.days_until_empty:.0f} days ({forecast.daily_rate:.1f}/day)"
+    if forecast.reorder_quantity:
+        text += f" | Reorder {forecast.reorder_quantity}"
+    return text
+
+
+def render_beverage_admin_row(
+    db: Session, b: BeverageRow, forecast: Optional[StockForecast] = None
+) -> None:
+    """Render a row for a beverage in the admin beverage management section."""
+    with ui.row():
+        ui.label(f"{b.name} | Price: {b.price_text} | Stock: {b.stock}")
+        ui.label(format_forecast(forecast)).classes("text-grey-7")
+
+        def make_stock_handler(bev_id):
+            def set_stock():
+                def submit_stock(new_stock):
+                    try:
+                        with log_action(logger, "set_stock", page="/admin", beverage_id=bev_id):
+                            update_beverage(db, bev_id, stock=int(new_stock))
+                        ui.notify("Stock updated")
+                        ui.navigate.to("/admin")
+                    except Exception:
+                        ui.notify("Error updating stock", color="negative")
+
+                rules = {"new_stock": [required(), numeric(), min_value(0)]}
+                with form(on_submit=submit_stock, rules=rules) as f:
+                    ui.input("New stock").props("key=new_stock type=number").mark(
+                        "Neuer Lagerbestand"
+                    )
+                    f.create_submit_button("Save", icon="save").mark("Speichern")
+
+            return set_stock
+
+        ui.button("Edit stock", on_click=make_stock_handler(b.id)).mark("Lager ändern")
+
+
+def render_create_beverage_form(db: Session) -> None:
+    """Render the form for admins to create a new beverage."""
+    def handle_create_beverage(name, price, stock):
+        fields = {"page": "/admin", "action": "create_beverage"}
+        try:
+            with log_action(logger, "create_beverage", page="/admin"):
+                create_beverage(db, name, float(price), int(stock))
+            logger.info(
+                "Admin created beverage %s (price=%s, stock=%s)", name, price, stock, extra=fields
+            )
+            ui.navigate.to("/admin")
+            ui.notify("Beverage created")
+        except Exception as e:
+            logger.error("Error creating beverage %s: %s", name, e, extra=fields)
+            ui.notify(str(e), color="negative")
+
+    rules = {
+        "name": [required()],
+        "price": [required(), numeric(), min_value(0)],
+        "stock": [required(), numeric(), min_value(0)],
+    }
+    with form(on_submit=handle_create_beverage, rules=rules) as f:
+        ui.input("Name").props("key=name").mark("Name")
+        ui.input("Price (€)").props("key=price type=number").mark("Preis (€)")
+        ui.input("Stock").props("key=stock type=number").mark("Neu in Lager")
+        f.create_submit_button("Create beverage", icon="add").mark("Getränk anlegen")
+
+
+def render_pending_transaction_row(db: Session, t: TransactionRow) -> None:
+    """Render a row for a pending deposit transaction with a confirm button."""
+    with ui.row():
+        ui.label(
+            f"{t.id} | User: {t.user_id} | Amount: {t.amount_text} € | {t.date_text} | {t.reference or '-'}"
+        )
+
+        def make_confirm_handler(tid):
+            def confirm():
+                try:
+                    with log_action(logger, "confirm_deposit", page="/admin", transaction_id=tid):
+                        confirm_transaction(db, tid)
+                    ui.notify("Deposit confirmed")
+                    ui.navigate.to("/admin")
+                except Exception as e:
+                    ui.notify(str(e), color="negative")
+
+            return confirm
+
+        ui.button("Confirm", on_click=make_confirm_handler(t.id)).mark("Bestätigen")
+
+
+def render_bank_import(db: Session, on_import: Callable[[], None]) -> None:
+    """Render the bank statement upload that confirms matching deposits and lists lines to review."""
+    def handle_upload(e: UploadEventArguments) -> None:
+        try:
+            with log_action(logger, "bank_import", page="/admin"):
+                result = import_bank_statement(db, decode_statement(e.content.read()))
+        except ValueError as error:
+            ui.notify(str(error), color="negative")
+            return
+        finally:
+            e.sender.reset()
+        ui.notify(
+            f"{result.confirmed} deposits confirmed, {len(result.review)} to review, "
+            f"{len(result.unmatched)} without deposit"
+        )
+        review.clear()
+        with review:
+            if result.review:
+                ui.label("To review").classes("text-subtitle1")
+            for item in result.review:
+                line = item.line
+                candidates = f" (deposits {', '.join(map(str, item.candidates))})" if item.candidates else ""
+                ui.label(
+                    f"Line {line.line} | {line.booked:%Y-%m-%d} | {line.cents / 100:.2f} € | "
+                    f"{line.name} {line.purpose} | {item.reason}{candidates}"
+                )
+        on_import()
+
+    ui.upload(label="Bank statement (CSV)", on_upload=handle_upload, auto_upload=True).props(
+        'accept=".csv,text/csv"'
+    ).mark("Kontoauszug")
+    review = ui.column()
+
+
+def parse_ledger_filters(
+    email_prefix: str,
+    transaction_type: str,
+    status: str,
+    min_amount: str,
+    max_amount: str,
+    date_from: str,
+    date_to: str,
+) -> dict:
+    """Convert the ledger filter form values into search_transactions arguments."""
+    def optional(value, convert):
+        return convert(value) if value not in (None, "") else None
+
+    date_to_day = optional(date_to, datetime.fromisoformat)
+    return {
+        "email_prefix": email_prefix or None,
+        "transaction_type": optional(transaction_type, TransactionType),
+        "status": optional(status, TransactionStatus),
+        "min_amount": optional(min_amount, float),
+        "max_amount": optional(max_amount, float),
+        "date_from": optional(date_from, datetime.fromisoformat),
+        # the end date is inclusive
+        "date_to": date_to_day + timedelta(days=1) if date_to_day else None,
+    }
+
+
+def ledger_table_row(t: Transaction, email: str) -> dict:
+    """Format a transaction with its user's e-mail for the ledger table."""
+    return {
+        "id": t.id,
+        "date": t.timestamp.strftime("%Y-%m-%d %H:%M"),
+        "user": email,
+        "type": t.type.value,
+        "amount": f"{t.amount:.2f}",
+        "status": t.status.value,
+    }
+
+
+def render_ledger(db: Session, user_id: Optional[int]) -> None:
+    """Render the filter form and the keyset-paginated table of all users' transactions."""
+    filters: dict = {"user_id": user_id}
+    cursor: Optional[tuple] = None
+
+    def load_page(reset: bool = False) -> None:
+        nonlocal cursor
+        if reset:
+            cursor = None
+            table.rows = []
+        with log_action(logger, "ledger_search", page="/admin/ledger"):
+            rows = search_transactions(db, **filters, before=cursor, limit=LEDGER_PAGE_SIZE)
+        table.add_rows([ledger_table_row(t, email) for t, email in rows])
+        if rows:
+            cursor = (rows[-1][0].timestamp, rows[-1][0].id)
+        load_button.set_visibility(len(rows) == LEDGER_PAGE_SIZE)
+
+    def handle_search(**values) -> None:
+        try:
+            parsed = parse_ledger_filters(**values)
+        except ValueError:
+            ui.notify("Invalid filter", color="negative")
+            return
+        filters.clear()
+        filters.update(parsed, user_id=user_id)
+        load_page(reset=True)
+
+    rules = {"min_amount": [numeric()], "max_amount": [numeric()]}
+    with form(on_submit=handle_search, rules=rules).classes("w-full") as f:
+        with ui.row():
+            ui.input("E-Mail prefix").props("key=email_prefix").mark("E-Mail-Präfix")
+            ui.select(
+                {"": "All", **{t.value: t.value for t in TransactionType}}, value="", label="Type"
+            ).props("key=transaction_type").classes("w-32")
+            ui.select(
+                {"": "All", **{s.value: s.value for s in TransactionStatus}}, value="", label="Status"
+            ).props("key=status").classes("w-32")
+        with ui.row():
+            ui.input("Min amount").props("key=min_amount type=number")
+            ui.input("Max amount").props("key=max_amount type=number")
+            ui.input("From").props("key=date_from type=date stack-label")
+            ui.input("To").props("key=date_to type=date stack-label")
+        f.create_submit_button("Search", icon="search").mark("Suchen")
+
+    table = ui.table(
+        columns=[
+            {"name": "date", "label": "Date", "field": "date"},
+            {"name": "user", "label": "User", "field": "user"},
+            {"name": "type", "label": "Type", "field": "type"},
+            {"name": "amount", "label": "Amount (€)", "field": "amount", "align": "left"},
+            {"name": "status", "label": "Status", "field": "status"},
+        ],
+        rows=[],
+        row_key="id",
+    ).classes("w-full")
+    load_button = ui.button("Load more", on_click=lambda: load_page()).mark("Mehr laden")
+    load_page()
+
+
+def render_admin_panel(db: Session) -> None:
+    """Render the deposit, user and beverage management sections of the admin page."""
+    # Einzahlungen bestätigen
+    ui.label("Open Transactions").classes("text-h6")
+
+    @ui.refreshable
+    def pending_rows() -> None:
+        for t in pending_transaction_rows(db):
+            render_pending_transaction_row(db, t)
+
+    pending_rows()
+    render_bank_import(db, pending_rows.refresh)
+    # Nutzerverwaltung
+    ui.label("User Management").classes("text-h6")
+    users = list_user_rows(db)
+    for u in users:
+        render_user_row(db, u)
+    render_create_user_form(db)
+    # Getränkeverwaltung
+    ui.label("Beverage Management").classes("text-h6")
+    beverages = list_beverage_rows(db)
+    forecasts = forecast_stock(db)
+    for b in beverages:
+        render_beverage_admin_row(db, b, forecasts.get(b.id))
+    render_create_beverage_form(db)
+
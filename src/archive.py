@@ -0,0 +1,97 @@
+# src/archive.py
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from src import database
+from src.logs import setup_logging
+from src.models import (
+    ArchivedTransaction,
+    BalanceCheckpoint,
+    Transaction,
+    TransactionStatus,
+)
+
+logger = logging.getLogger("matekasse")
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+_ARCHIVED_COLUMNS = ("id", "user_id", "amount", "type", "status", "timestamp", "beverage_id", "reference")
+
+
+def archive_transactions(
+    db: Session, older_than: timedelta, now: Optional[datetime] = None
+) -> int:
+    """
+    Moves confirmed transactions older than ``older_than`` into the archive table.
+    The archived amounts are first rolled into one balance checkpoint per user.
+    Pending transactions always stay in the hot table.
+    Returns the number of archived transactions.
+    """
+    cutoff = (now or datetime.utcnow()) - older_than
+    eligible = (
+        Transaction.status == TransactionStatus.CONFIRMED,
+        Transaction.timestamp < cutoff,
+    )
+    # Copy first: on SQLite the write takes the database lock, so the roll-up
+    # below and the delete see exactly the rows that were copied.
+    db.execute(
+        insert(ArchivedTransaction).from_select(
+            _ARCHIVED_COLUMNS,
+            select(*(getattr(Transaction, c) for c in _ARCHIVED_COLUMNS)).where(*eligible),
+        )
+    )
+    totals = db.execute(
+        select(Transaction.user_id, func.sum(Transaction.amount), func.count())
+        .where(*eligible)
+        .group_by(Transaction.user_id)
+    ).all()
+    if not totals:
+        db.rollback()
+        return 0
+    archived = 0
+    for user_id, amount, count in totals:
+        checkpoint = db.get(BalanceCheckpoint, user_id)
+        if checkpoint is None:
+            checkpoint = BalanceCheckpoint(
+                user_id=user_id, archived_amount=0.0, archived_count=0
+            )
+            db.add(checkpoint)
+        checkpoint.archived_amount += amount
+        checkpoint.archived_count += count
+        if checkpoint.archived_until is None or checkpoint.archived_until < cutoff:
+            checkpoint.archived_until = cutoff
+        checkpoint.updated_at = datetime.utcnow()
+        archived += count
+    db.execute(delete(Transaction).where(*eligible))
+    db.commit()
+    return archived
+
+
+def run_archive_job(days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """Runs the archive job against the database of every tenant."""
+    total = 0
+    for tenant, engine in database.iter_engines(include_idle=True):
+        with sessionmaker(bind=engine)() as db:
+            archived = archive_transactions(db, timedelta(days=days))
+        logger.info("Archived %s transactions older than %s days for %s", archived, days, tenant)
+        total += archived
+    return total
+
+
+def main() -> None:
+    """Command line entry point: ``python -m src.archive --days 365``."""
+    parser = argparse.ArgumentParser(description="Archive old confirmed transactions.")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+    setup_logging(fmt="text")
+    run_archive_job(args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# src/bankimport.py
+import csv
+import io
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models import Transaction, TransactionStatus, TransactionType, User
+from src.services import REFERENCE_ALPHABET, REFERENCE_LENGTH, REFERENCE_PREFIX, confirm_deposits
+
+logger = logging.getLogger("matekasse")
+
+# Statement lines may be booked this many days before or after the deposit was recorded
+BANK_MATCH_TOLERANCE_DAYS = int(os.getenv("BANK_MATCH_TOLERANCE_DAYS", "7"))
+
+# Column names used by German online banking exports, first match wins
+HEADER_ALIASES = {
+    "date": ("buchungstag", "buchungsdatum", "datum", "date", "valuta", "wertstellung"),
+    "amount": ("betrag", "betrag (eur)", "umsatz", "amount"),
+    "purpose": ("verwendungszweck", "buchungstext", "purpose"),
+    "name": ("name", "auftraggeber", "zahlungspflichtige*r", "beguenstigter/zahlungspflichtiger", "payer"),
+}
+DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d")
+
+_REFERENCE = re.compile(
+    rf"\b{re.escape(REFERENCE_PREFIX.rstrip('-'))}[\s-]?([{REFERENCE_ALPHABET}]{{{REFERENCE_LENGTH}}})\b",
+    re.IGNORECASE,
+)
+
+
+class StatementLine(NamedTuple):
+    """An incoming payment from the bank statement."""
+
+    line: int
+    booked: date
+    cents: int
+    purpose: str
+    name: str
+
+
+class PendingDeposit(NamedTuple):
+    """A pending deposit as needed for matching."""
+
+    id: int
+    user_id: int
+    email: str
+    cents: int
+    booked: date
+    reference: Optional[str]
+
+
+@dataclass
+class ReviewItem:
+    """A statement line an admin has to match by hand."""
+
+    line: StatementLine
+    reason: str
+    candidates: List[int] = field(default_factory=list)
+
+
+@dataclass
+class BankImportResult:
+    """Outcome of matching a bank statement against the pending deposits."""
+
+    matched: Dict[int, StatementLine] = field(default_factory=dict)
+    review: List[ReviewItem] = field(default_factory=list)
+    unmatched: List[StatementLine] = field(default_factory=list)
+    invalid: List[int] = field(default_factory=list)
+    confirmed: int = 0
+
+
+def decode_statement(data: bytes) -> str:
+    """Decodes an uploaded statement; banks export either UTF-8 or Windows-1252."""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252")
+
+
+def parse_amount(text: str) -> int:
+    """Parses a German amount like ``1.234,56`` or ``-5,00 €`` into cents."""
+    text = text.replace("€", "").replace("EUR", "").replace("\u00a0", "").replace(" ", "")
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        return _cents(Decimal(text))
+    except InvalidOperation as e:
+        raise ValueError(f"Invalid amount {text!r}") from e
+
+
+def _cents(amount: float) -> int:
+    return int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def parse_date(text: str) -> date:
+    """Parses a booking date in one of DATE_FORMATS."""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date {text!r}")
+
+
+def _header_columns(row: List[str]) -> Optional[Dict[str, int]]:
+    names = [cell.strip().lower() for cell in row]
+    columns = {}
+    for key, aliases in HEADER_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[key] = names.index(alias)
+                break
+    return columns if "date" in columns and "amount" in columns else None
+
+
+def parse_statement(text: str, result: Optional[BankImportResult] = None) -> List[StatementLine]:
+    """
+    Parses a ``;``-separated statement with decimal commas. Lines before the header row
+    (account details of some banks) are skipped; unreadable rows are recorded in ``result.invalid``.
+    """
+    columns = None
+    lines = []
+    for number, row in enumerate(csv.reader(io.StringIO(text), delimiter=";"), start=1):
+        if columns is None:
+            columns = _header_columns(row)
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+
+        def cell(key: str) -> str:
+            index = columns.get(key)
+            return row[index].strip() if index is not None and index < len(row) else ""
+
+        try:
+            lines.append(
+                StatementLine(number, parse_date(cell("date")), parse_amount(cell("amount")), cell("purpose"), cell("name"))
+            )
+        except ValueError:
+            if result is not None:
+                result.invalid.append(number)
+    if columns is None:
+        raise ValueError("No header row with date and amount columns found")
+    return lines
+
+
+def find_reference(text: str) -> Optional[str]:
+    """Returns the deposit reference code in a transfer's purpose, normalized to ``MK-XXXXXX``."""
+    match = _REFERENCE.search(text)
+    return REFERENCE_PREFIX + match.group(1).upper() if match else None
+
+
+def _mentions_user(line: StatementLine, deposit: PendingDeposit) -> bool:
+    local_part = deposit.email.split("@")[0].lower()
+    return len(local_part) >= 3 and local_part in f"{line.purpose} {line.name}".lower()
+
+
+def match_deposits(
+    lines: Iterable[StatementLine],
+    deposits: Iterable[PendingDeposit],
+    tolerance_days: int = BANK_MATCH_TOLERANCE_DAYS,
+    result: Optional[BankImportResult] = None,
+) -> BankImportResult:
+    """
+    Matches incoming payments to pending deposits in linear time through dict indexes on the
+    reference code and on the amount. A reference code wins; without one the amount must be
+    unique within the date window, or unique among the deposits whose user the transfer names.
+    Deposits claimed by several lines and all doubtful lines end up in ``result.review``.
+    """
+    result = result or BankImportResult()
+    tolerance = timedelta(days=tolerance_days)
+    by_reference: Dict[str, List[PendingDeposit]] = defaultdict(list)
+    by_amount: Dict[int, List[PendingDeposit]] = defaultdict(list)
+    for deposit in deposits:
+        if deposit.reference:
+            by_reference[deposit.reference].append(deposit)
+        by_amount[deposit.cents].append(deposit)
+
+    claims: Dict[int, List[StatementLine]] = defaultdict(list)
+    without_reference = []
+    for line in lines:
+        if line.cents <= 0:
+            continue
+        reference = find_reference(line.purpose)
+        if reference is None:
+            without_reference.append(line)
+            continue
+        sharing = by_reference.get(reference, [])
+        deposit = sharing[0] if len(sharing) == 1 else None
+        if not sharing:
+            result.review.append(ReviewItem(line, f"Unknown reference {reference}"))
+        elif deposit is None:
+            # never guess between deposits that share a code
+            result.review.append(
+                ReviewItem(line, "Several deposits with this reference", [other.id for other in sharing])
+            )
+        elif deposit.cents != line.cents:
+            result.review.append(ReviewItem(line, "Amount differs from the deposit", [deposit.id]))
+        elif abs(line.booked - deposit.booked) > tolerance:
+            result.review.append(ReviewItem(line, "Booked outside the date window", [deposit.id]))
+        else:
+            claims[deposit.id].append(line)
+
+    # deposits claimed by their reference code are not offered to lines without one
+    referenced = set(claims)
+    for line in without_reference:
+        candidates = [
+            deposit
+            for deposit in by_amount.get(line.cents, ())
+            if deposit.id not in referenced and abs(line.booked - deposit.booked) <= tolerance
+        ]
+        if len(candidates) > 1:
+            named = [deposit for deposit in candidates if _mentions_user(line, deposit)]
+            if len(named) == 1:
+                candidates = named
+        if not candidates:
+            result.unmatched.append(line)
+        elif len(candidates) == 1:
+            claims[candidates[0].id].append(line)
+        else:
+            result.review.append(
+                ReviewItem(line, "Several deposits with this amount", [deposit.id for deposit in candidates])
+            )
+
+    for deposit_id, claimed in claims.items():
+        if len(claimed) == 1:
+            result.matched[deposit_id] = claimed[0]
+        else:
+            result.review.extend(ReviewItem(line, "Several lines match one deposit", [deposit_id]) for line in claimed)
+    result.review.sort(key=lambda item: item.line.line)
+    return result
+
+
+def load_pending_deposits(db: Session) -> List[PendingDeposit]:
+    """Returns all pending deposits with their user's e-mail."""
+    rows = db.execute(
+        select(
+            Transaction.id,
+            Transaction.user_id,
+            User.email,
+            Transaction.amount,
+            Transaction.timestamp,
+            Transaction.reference,
+        )
+        .join(User, User.id == Transaction.user_id)
+        .where(Transaction.status == TransactionStatus.PENDING, Transaction.type == TransactionType.DEPOSIT)
+    )
+    return [
+        PendingDeposit(id, user_id, email, _cents(amount), timestamp.date(), reference)
+        for id, user_id, email, amount, timestamp, reference in rows
+    ]
+
+
+def import_bank_statement(
+    db: Session, text: str, tolerance_days: int = BANK_MATCH_TOLERANCE_DAYS
+) -> BankImportResult:
+    """Matches a bank statement against the pending deposits and confirms all unambiguous matches."""
+    result = BankImportResult()
+    lines = parse_statement(text, result)
+    match_deposits(lines, load_pending_deposits(db), tolerance_days, result)
+    result.confirmed = confirm_deposits(db, result.matched, source="bank_import")
+    logger.info(
+        "Bank import: %s lines, %s confirmed, %s to review, %s unmatched, %s invalid",
+        len(lines),
+        result.confirmed,
+        len(result.review),
+        len(result.unmatched),
+        len(result.invalid),
+        extra={"action": "bank_import"},
+    )
+    return result
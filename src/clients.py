@@ -0,0 +1,136 @@
+# src/clients.py
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Set
+
+from nicegui import Client, context, ui
+from nicegui.element import Element
+from nicegui.events import GenericEventArguments
+
+logger = logging.getLogger("matekasse")
+
+# Pages hidden for longer than this are cleared and re-rendered when shown again; 0 disables eviction
+CLIENT_IDLE_TIMEOUT_MINUTES = float(os.getenv("CLIENT_IDLE_TIMEOUT_MINUTES", "30"))
+CLIENT_STATS_LIMIT = 20
+
+VISIBILITY_EVENT = "matekasse_visibility"
+VISIBILITY_SCRIPT = (
+    "<script>document.addEventListener('visibilitychange', "
+    f"() => emitEvent('{VISIBILITY_EVENT}', document.visibilityState));</script>"
+)
+
+
+def element_bytes(element: Element) -> int:
+    """Shallow size estimate of an element with its props, classes, style and event listeners."""
+    parts = (
+        element,
+        element.__dict__,
+        element._props,  # pylint: disable=protected-access
+        element._classes,  # pylint: disable=protected-access
+        element._style,  # pylint: disable=protected-access
+        element._event_listeners,  # pylint: disable=protected-access
+    )
+    return sum(sys.getsizeof(part) for part in parts)
+
+
+def client_db(client: Client) -> Any:
+    """Returns the database session opened for the client's page request, if any."""
+    if client.request is None:
+        return None
+    return getattr(client.request.state, "db", None)
+
+
+class ClientTracker:
+    """
+    Tracks which browser tabs are hidden and releases the pages of tabs hidden for too long.
+    An evicted page keeps its connection and reloads itself once the tab is visible again.
+    """
+
+    def __init__(self) -> None:
+        self._hidden_since: Dict[str, float] = {}
+        self._evicted: Set[str] = set()
+
+    def watch(self) -> None:
+        """Reports visibility changes of the current page; call while building the page."""
+        client = context.client
+        ui.add_body_html(VISIBILITY_SCRIPT)
+        ui.on(VISIBILITY_EVENT, lambda e: self._on_visibility(client, e))
+
+    def _on_visibility(self, client: Client, e: GenericEventArguments) -> None:
+        if e.args == "hidden":
+            self._hidden_since.setdefault(client.id, time.monotonic())
+            return
+        self._hidden_since.pop(client.id, None)
+        if client.id in self._evicted:
+            self._evicted.discard(client.id)
+            with client:
+                ui.navigate.reload()
+
+    def evict(self, client: Client) -> None:
+        """Drops the element tree of ``client`` and closes its database session."""
+        elements = len(client.elements)
+        client.content.clear()
+        db = client_db(client)
+        if db is not None:
+            db.close()
+            # a referenced session keeps its tenant's engine from being disposed
+            client.request.state.db = None
+        self._evicted.add(client.id)
+        logger.info(
+            "Evicted idle page %s with %s elements",
+            client.page.path,
+            elements,
+            extra={"action": "evict_client", "page": client.page.path},
+        )
+
+    def evict_idle(self, max_idle_seconds: float) -> int:
+        """Evicts every page hidden for at least ``max_idle_seconds`` and returns how many were evicted."""
+        deadline = time.monotonic() - max_idle_seconds
+        evicted = 0
+        for client_id in list(self._hidden_since):
+            client = Client.instances.get(client_id)
+            if client is None:
+                # tab closed and client deleted by NiceGUI
+                self._hidden_since.pop(client_id)
+                self._evicted.discard(client_id)
+            elif self._hidden_since[client_id] <= deadline and client_id not in self._evicted:
+                self.evict(client)
+                evicted += 1
+        return evicted
+
+    def stats(self, limit: int = CLIENT_STATS_LIMIT) -> Dict[str, Any]:
+        """Returns element counts and size estimates per client, largest first."""
+        now = time.monotonic()
+        clients: List[Dict[str, Any]] = []
+        for client in list(Client.instances.values()):
+            if client.shared:
+                continue
+            db = client_db(client)
+            hidden_since = self._hidden_since.get(client.id)
+            clients.append({
+                "page": client.page.path,
+                "elements": len(client.elements),
+                "approx_bytes": sum(element_bytes(e) for e in list(client.elements.values())),
+                "orm_objects": len(db.identity_map) if db is not None else 0,
+                "hidden_seconds": round(now - hidden_since, 1) if hidden_since is not None else None,
+                "evicted": client.id in self._evicted,
+            })
+        clients.sort(key=lambda c: c["elements"], reverse=True)
+        return {
+            "count": len(clients),
+            "hidden": sum(1 for c in clients if c["hidden_seconds"] is not None),
+            "evicted": sum(1 for c in clients if c["evicted"]),
+            "elements": sum(c["elements"] for c in clients),
+            "approx_bytes": sum(c["approx_bytes"] for c in clients),
+            "largest": clients[:limit],
+        }
+
+
+client_tracker = ClientTracker()
+
+
+async def evict_idle_clients() -> int:
+    """Scheduler job; runs on the event loop because it changes NiceGUI elements."""
+    return client_tracker.evict_idle(CLIENT_IDLE_TIMEOUT_MINUTES * 60)
@@ -1,22 +1,162 @@
-from typing import Callable, Optional, Dict, Any
+import json
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional, Dict, Any, List, Tuple
 from nicegui import ui
+from nicegui.element import Element
+from nicegui.events import GenericEventArguments
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Validierungsregel, die im Browser (js) und auf dem Server (check) gleich geprüft wird"""
+    message: str
+    js: str
+    check: Callable[[Any], bool]
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or str(value).strip() == ''
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# JS-Ausdrücke prüfen den Wert `v`; leere Werte gelten nur bei `required` als Fehler
+_JS_EMPTY = "(v === null || v === undefined || String(v).trim() === '')"
+_JS_NUMBER = "(String(v).trim() !== '' && isFinite(Number(v)))"
+
+
+def required(message: str = 'Required') -> Rule:
+    """Wert muss gesetzt sein"""
+    return Rule(message, f'!{_JS_EMPTY}', lambda v: not _is_empty(v))
+
+
+def numeric(message: str = 'Must be a number') -> Rule:
+    """Wert muss eine Zahl sein"""
+    return Rule(message, f'{_JS_EMPTY} || {_JS_NUMBER}', lambda v: _is_empty(v) or _as_float(v) is not None)
+
+
+def min_value(minimum: float, message: Optional[str] = None) -> Rule:
+    """Zahl muss mindestens `minimum` sein"""
+    return Rule(
+        message or f'Must be at least {minimum:g}',
+        f'{_JS_EMPTY} || ({_JS_NUMBER} && Number(v) >= {minimum!r})',
+        lambda v: _is_empty(v) or (_as_float(v) is not None and _as_float(v) >= minimum),
+    )
+
+
+def max_value(maximum: float, message: Optional[str] = None) -> Rule:
+    """Zahl darf höchstens `maximum` sein"""
+    return Rule(
+        message or f'Must be at most {maximum:g}',
+        f'{_JS_EMPTY} || ({_JS_NUMBER} && Number(v) <= {maximum!r})',
+        lambda v: _is_empty(v) or (_as_float(v) is not None and _as_float(v) <= maximum),
+    )
+
+
+def email(message: str = 'Invalid e-mail address') -> Rule:
+    """Wert muss wie eine E-Mail-Adresse aussehen"""
+    return Rule(
+        message,
+        f'{_JS_EMPTY} || /{EMAIL_PATTERN}/.test(String(v).trim())',
+        lambda v: _is_empty(v) or re.match(EMAIL_PATTERN, str(v).strip()) is not None,
+    )
+
 
 class form(ui.card):
-    def __init__(self, on_submit: Optional[Callable] = None, **kwargs) -> None:
+    """
+    Formular, das Felder mit key-Property einmalig beim Verlassen des with-Blocks registriert.
+    Texteingaben werden nicht bei jedem Tastendruck synchronisiert, sondern beim Absenden
+    in einer Nachricht übertragen; `rules` werden zuerst im Browser und dann auf dem Server geprüft.
+    """
+
+    def __init__(self, on_submit: Optional[Callable] = None, rules: Optional[Dict[str, List[Rule]]] = None, **kwargs) -> None:
         super().__init__(**kwargs)
         self.elements: Dict[str, Any] = {}
+        self.rules: Dict[str, List[Rule]] = rules or {}
         self.on_submit_callback = on_submit
         self.submit_button = None
         self._container = None
+        self._deferred: Dict[str, ui.input] = {}
+        self._triggers: List[Tuple[Element, str]] = []
+        self._registered = False
 
     def __enter__(self):
         self._container = super().__enter__()
         return self
 
+    def __exit__(self, *args) -> None:
+        super().__exit__(*args)
+        self.register_fields()
+
+    def register_fields(self) -> None:
+        """Registriert einmalig alle Elemente mit key-Property und verbindet die Submit-Auslöser"""
+        for descendant in self.descendants():
+            key = descendant.props.get('key')
+            if key is not None and key not in self.elements:
+                self.add_element(descendant, key)
+        self._registered = True
+        for element, event in self._triggers:
+            self._attach_trigger(element, event)
+
     def add_element(self, element: Any, key: str) -> None:
         """Speichert Referenz zu Elementen mit key-Property"""
-        if hasattr(element, 'props') and 'key' in element.props:
-            self.elements[key] = element
+        self.elements[key] = element
+        rules = self.rules.get(key)
+        if rules:
+            element.props[':rules'] = '[' + ', '.join(
+                f'v => ({rule.js}) || {json.dumps(rule.message)}' for rule in rules
+            ) + ']'
+            element.props['lazy-rules'] = True
+        if isinstance(element, ui.input):
+            self._defer_value_updates(element)
+            self._deferred[key] = element
+        element.update()
+
+    @staticmethod
+    def _defer_value_updates(element: ui.input) -> None:
+        """
+        Schaltet das Senden des Werts bei jedem Tastendruck ab; der Wert bleibt im Browser.
+        Greift auf NiceGUIs Listener-Liste zu, daher ist nicegui in pyproject.toml auf 2.x begrenzt.
+        """
+        for listener in element._event_listeners.values():  # pylint: disable=protected-access
+            if listener.type == f'update:{element.VALUE_PROP}':
+                # a throttled event without leading or trailing call is never emitted
+                listener.throttle = 1.0
+                listener.leading_events = False
+                listener.trailing_events = False
+
+    def _submit_js(self) -> str:
+        fields = json.dumps({key: element.id for key, element in self._deferred.items()})
+        return f'''() => {{
+            const fields = {fields};
+            const values = {{}};
+            let valid = true;
+            for (const [key, id] of Object.entries(fields)) {{
+                const field = getElement(id);
+                if (!field) continue;
+                if (field.$refs.qRef?.validate() === false) valid = false;
+                values[key] = field.inputValue ?? null;
+            }}
+            if (valid) emit({{values}});
+        }}'''
+
+    def _attach_trigger(self, element: Element, event: str) -> None:
+        element.on(event, self._handle_submit_event, js_handler=self._submit_js())
+
+    def submit_on(self, element: Element, event: str) -> None:
+        """Sendet das Formular, wenn `event` auf `element` ausgelöst wird (z.B. keydown.enter)"""
+        if self._registered:
+            self._attach_trigger(element, event)
+        else:
+            self._triggers.append((element, event))
 
     def collect_values(self) -> Dict[str, Any]:
         """Sammelt Werte aller Elemente mit key-Property"""
@@ -25,25 +165,42 @@ class form(ui.card):
             # Zugriff auf den Wert über das Value-Model des Elements
             if hasattr(element, 'value'):
                 values[key] = element.value
-            elif hasattr(element, 'values') and hasattr(element, 'value'):
-                # Für Elemente wie Select mit options
-                values[key] = element.value
         return values
 
+    def validate(self, values: Dict[str, Any]) -> List[str]:
+        """Prüft die Regeln auf dem Server und gibt die Fehlermeldungen zurück"""
+        return [
+            rule.message
+            for key, rules in self.rules.items()
+            for rule in rules
+            if not rule.check(values.get(key))
+        ]
+
+    def _handle_submit_event(self, e: GenericEventArguments) -> None:
+        client_values = e.args.get('values') if isinstance(e.args, dict) else None
+        if client_values:
+            for key, value in client_values.items():
+                element = self._deferred.get(key)
+                if element is not None:
+                    # den Serverstand nachziehen; der Browser hat diesen Wert bereits
+                    element.set_value(value)
+        self.submit()
+
     def submit(self) -> None:
         """Handler für Submit-Ereignis"""
-        # check if descendant elements exist
-        for descendant in self._container.descendants():
-            if hasattr(descendant, 'props') and 'key' in descendant.props:
-                self.add_element(descendant, descendant.props['key'])
+        values = self.collect_values()
+        errors = self.validate(values)
+        if errors:
+            ui.notify(errors[0], color='negative')
+            return
         if self.on_submit_callback:
-            kwargs = self.collect_values()
-            self.on_submit_callback(**kwargs)
+            self.on_submit_callback(**values)
 
     def create_submit_button(self, label: str = 'Submit', **kwargs) -> None:
         """Erstellt den Submit-Button mit optionalen Eigenschaften"""
         with ui.row().classes('w-full justify-end'):
-            self.submit_button = ui.button(label, on_click=self.submit, **kwargs)
+            self.submit_button = ui.button(label, **kwargs)
+            self.submit_on(self.submit_button, 'click')
             return self.submit_button
 
 def example_usage():
@@ -51,10 +208,9 @@ def example_usage():
         print("Submitted values:", kwargs)
         ui.notify(f"Received values: {kwargs}")
 
-    with form(on_submit=handle_submit) as f:
+    with form(on_submit=handle_submit, rules={'name': [required()], 'email': [required(), email()]}) as f:
         ui.input('Name').props('key=name')
         ui.input('Email').props('key=email type=email')
         ui.select(['Water', 'Beer', 'Soda'], label='Drink').props('key=drink')
         ui.checkbox('Agree to terms').props('key=agree')
         f.create_submit_button('Save', icon='save')
-
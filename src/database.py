@@ -1,9 +1,247 @@
 import os
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from weakref import WeakSet
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./drinkskasse.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DEFAULT_TENANT = "default"
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+# Additional kitchens served by this process, e.g. "floor1,floor2"
+TENANTS = [t.strip() for t in os.getenv("TENANTS", "").split(",") if t.strip()]
+TENANT_DATABASE_URL = os.getenv("TENANT_DATABASE_URL", "sqlite:///./data/{tenant}.db")
+TENANT_ENGINE_CACHE_SIZE = int(os.getenv("TENANT_ENGINE_CACHE_SIZE", "16"))
+TENANT_IDLE_MINUTES = float(os.getenv("TENANT_IDLE_MINUTES", "30"))
+
+for _tenant in TENANTS:
+    if not TENANT_NAME.match(_tenant) or _tenant == DEFAULT_TENANT:
+        raise ValueError(f"Invalid tenant name {_tenant!r}")
+
+
+class StatementCacheStats:
+    """
+    Counts whether executed statements were taken from SQLAlchemy's compiled-statement cache.
+    Raw driver SQL and DDL count as uncached.
+    """
+
+    def __init__(self) -> None:
+        self._counts: Counter = Counter()
+        self._lock = Lock()
+
+    def track(self, engine: Engine) -> None:
+        """Counts every statement executed on ``engine``."""
+        event.listen(engine, "after_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context: Any, executemany: bool) -> None:
+        cache_hit = getattr(context, "cache_hit", None)
+        outcome = cache_hit.name if cache_hit is not None else "NO_CACHE_KEY"
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Returns hits, misses, uncached statements and the hit ratio of cacheable statements."""
+        with self._lock:
+            hits = self._counts["CACHE_HIT"]
+            misses = self._counts["CACHE_MISS"]
+            uncached = sum(self._counts.values()) - hits - misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncached": uncached,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+
+statement_cache = StatementCacheStats()
+
+
+def _create_engine(url: str) -> Engine:
+    if make_url(url).get_backend_name() == "sqlite":
+        new_engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        new_engine = create_engine(url)
+    statement_cache.track(new_engine)
+    return new_engine
+
+
+engine = _create_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"tenant": DEFAULT_TENANT})
+
+
+def configure_sqlite(engine) -> None:
+    """Enable WAL and incremental vacuum so maintenance can run while the app writes."""
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # auto_vacuum only takes effect on a database without tables yet
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+class TrackingSessionmaker(sessionmaker):
+    """Session factory that remembers the sessions it handed out while they are referenced."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.sessions: "WeakSet[Session]" = WeakSet()
+
+    def __call__(self, **local_kw: Any) -> Session:
+        session = super().__call__(**local_kw)
+        self.sessions.add(session)
+        return session
+
+
+@dataclass
+class _OpenEngine:
+    engine: Engine
+    factory: TrackingSessionmaker
+    used: float = field(default_factory=time.monotonic)
+
+    def in_use(self) -> bool:
+        # pages keep their session after the request, and a disposed engine would
+        # silently get a new, untracked pool through it
+        checked_out = getattr(self.engine.pool, "checkedout", lambda: 0)()
+        return checked_out > 0 or len(self.factory.sessions) > 0
+
+
+class EngineCache:
+    """
+    Lazily opened engines for tenant databases, bounded by an LRU.
+    Engines that were not used for a while are disposed to release their file handles,
+    but only once no session or connection of theirs is alive any more.
+    """
+
+    def __init__(self, url_template: str, max_engines: int) -> None:
+        self.url_template = url_template
+        self.max_engines = max_engines
+        # called once with every newly opened engine, e.g. to create the schema
+        self.on_open: Optional[Callable[[Engine], None]] = None
+        self._entries: "OrderedDict[str, _OpenEngine]" = OrderedDict()
+        self._lock = Lock()
+
+    def url(self, tenant: str) -> str:
+        """Returns the database URL of ``tenant``."""
+        url = self.url_template.format(tenant=tenant)
+        database = make_url(url).database
+        if make_url(url).get_backend_name() == "sqlite" and database not in (None, "", ":memory:"):
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        return url
+
+    def exists(self, tenant: str) -> bool:
+        """Returns False for a SQLite tenant whose database file was never created."""
+        url = make_url(self.url_template.format(tenant=tenant))
+        if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+            return True
+        return os.path.exists(url.database)
+
+    def create_engine(self, tenant: str) -> Engine:
+        """Creates a new, uncached engine for ``tenant``."""
+        tenant_engine = _create_engine(self.url(tenant))
+        configure_sqlite(tenant_engine)
+        return tenant_engine
+
+    def sessionmaker(self, tenant: str) -> sessionmaker:
+        """Returns the session factory of ``tenant``, opening its engine if needed."""
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                entry.used = time.monotonic()
+                self._entries.move_to_end(tenant)
+                return entry.factory
+            tenant_engine = self.create_engine(tenant)
+            if self.on_open is not None:
+                try:
+                    self.on_open(tenant_engine)
+                except Exception:
+                    tenant_engine.dispose()
+                    raise
+            factory = TrackingSessionmaker(
+                autocommit=False, autoflush=False, bind=tenant_engine, info={"tenant": tenant}
+            )
+            self._entries[tenant] = _OpenEngine(tenant_engine, factory)
+            # least recently used first; engines still in use may keep the cache above its size
+            for lru_tenant in list(self._entries)[:-1]:
+                if len(self._entries) <= self.max_engines:
+                    break
+                if not self._entries[lru_tenant].in_use():
+                    self._entries.pop(lru_tenant).engine.dispose()
+            return factory
+
+    def get_open(self, tenant: str) -> Optional[Engine]:
+        """Returns the engine of ``tenant`` if it is open, without counting as a use."""
+        with self._lock:
+            entry = self._entries.get(tenant)
+            return entry.engine if entry else None
+
+    def evict_idle(self, max_idle_seconds: float) -> List[str]:
+        """Disposes all engines unused for ``max_idle_seconds`` and no longer in use; returns their tenants."""
+        deadline = time.monotonic() - max_idle_seconds
+        with self._lock:
+            idle = [
+                tenant for tenant, entry in self._entries.items() if entry.used <= deadline and not entry.in_use()
+            ]
+            for tenant in idle:
+                self._entries.pop(tenant).engine.dispose()
+        return idle
+
+    def stats(self) -> Dict[str, float]:
+        """Returns the idle time in seconds of every open engine."""
+        now = time.monotonic()
+        with self._lock:
+            return {tenant: round(now - entry.used, 1) for tenant, entry in self._entries.items()}
+
+
+tenant_engines = EngineCache(TENANT_DATABASE_URL, TENANT_ENGINE_CACHE_SIZE)
+
+
+def is_tenant(tenant: str) -> bool:
+    """Returns whether ``tenant`` is served by this process."""
+    return tenant == DEFAULT_TENANT or tenant in TENANTS
+
+
+def session_tenant(db: Session) -> str:
+    """Returns the tenant whose database ``db`` works on."""
+    return db.info.get("tenant", DEFAULT_TENANT)
+
+
+def get_sessionmaker(tenant: str = DEFAULT_TENANT) -> sessionmaker:
+    """Returns the session factory for ``tenant``; the default tenant uses DATABASE_URL."""
+    if tenant == DEFAULT_TENANT:
+        return SessionLocal
+    if tenant not in TENANTS:
+        raise KeyError(f"Unknown tenant {tenant!r}")
+    return tenant_engines.sessionmaker(tenant)
+
+
+def iter_engines(include_idle: bool = False) -> Iterator[Tuple[str, Engine]]:
+    """
+    Yields (tenant, engine) for the default database and every open tenant engine.
+    With ``include_idle`` closed tenants are visited too, through a temporary engine.
+    """
+    yield DEFAULT_TENANT, engine
+    for tenant in TENANTS:
+        tenant_engine = tenant_engines.get_open(tenant)
+        if tenant_engine is not None:
+            yield tenant, tenant_engine
+        elif include_idle and tenant_engines.exists(tenant):
+            temporary = tenant_engines.create_engine(tenant)
+            try:
+                yield tenant, temporary
+            finally:
+                temporary.dispose()
+
+
+configure_sqlite(engine)
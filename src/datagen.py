@@ -0,0 +1,207 @@
+# src/datagen.py
+import argparse
+import logging
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import bindparam, create_engine, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from src.logs import setup_logging
+from src.migrations import migrate
+from src.models import (
+    Beverage,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+)
+from src.services import hash_password
+
+logger = logging.getLogger("matekasse")
+
+BEVERAGES = [
+    ("Club-Mate", 1.5),
+    ("Flora-Mate", 1.5),
+    ("Mio Mio Mate", 1.5),
+    ("Cola", 1.2),
+    ("Spezi", 1.2),
+    ("Apfelschorle", 1.0),
+    ("Wasser", 0.5),
+    ("Kaffee", 0.3),
+]
+DEPOSIT_AMOUNTS = [5.0, 10.0, 20.0, 20.0, 50.0]
+DEPOSIT_SHARE = 0.08
+PENDING_DAYS = 7
+
+
+def _day_weights(start: datetime, days: int) -> List[float]:
+    """Office traffic: busy on weekdays, almost nothing on weekends."""
+    return [1.0 if (start + timedelta(days=d)).weekday() < 5 else 0.1 for d in range(days)]
+
+
+def _seconds_into_day(rng: random.Random) -> int:
+    """Most drinks are bought around lunch, few before 7 or after 20 o'clock."""
+    hour = min(max(rng.gauss(13.0, 3.0), 7.0), 20.0)
+    return int(hour * 3600)
+
+
+def _transaction_rows(
+    rng: random.Random,
+    user_ids: List[int],
+    beverages: List[tuple],
+    count: int,
+    start: datetime,
+    days: int,
+    balances: Dict[int, float],
+) -> Iterator[dict]:
+    """Yields ``count`` transactions in chronological order, updating ``balances``."""
+    # A few heavy drinkers and a long tail of occasional ones
+    activity = [rng.paretovariate(1.5) for _ in user_ids]
+    per_day = [0] * days
+    for day in rng.choices(range(days), weights=_day_weights(start, days), k=count):
+        per_day[day] += 1
+    pending_from = days - PENDING_DAYS
+    for day, n in enumerate(per_day):
+        if not n:
+            continue
+        day_start = start + timedelta(days=day)
+        users = rng.choices(user_ids, weights=activity, k=n)
+        for seconds, user_id in sorted(zip((_seconds_into_day(rng) for _ in range(n)), users)):
+            if rng.random() < DEPOSIT_SHARE:
+                amount = rng.choice(DEPOSIT_AMOUNTS)
+                beverage_id = None
+                transaction_type = TransactionType.DEPOSIT
+                pending = day >= pending_from and rng.random() < 0.5
+                status = TransactionStatus.PENDING if pending else TransactionStatus.CONFIRMED
+            else:
+                beverage_id, price = rng.choice(beverages)
+                amount = -price
+                transaction_type = TransactionType.PURCHASE
+                status = TransactionStatus.CONFIRMED
+            if status == TransactionStatus.CONFIRMED:
+                balances[user_id] += amount
+            yield {
+                "user_id": user_id,
+                "amount": amount,
+                "type": transaction_type,
+                "status": status,
+                "timestamp": day_start + timedelta(seconds=seconds),
+                "beverage_id": beverage_id,
+            }
+
+
+def _insert_batched(conn: Connection, table, rows, batch_size: int) -> int:
+    """Inserts ``rows`` through executemany in batches of ``batch_size``."""
+    statement = insert(table)
+    batch: List[dict] = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(statement, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(statement, batch)
+        total += len(batch)
+    return total
+
+
+def generate(
+    engine: Engine,
+    users: int = 1000,
+    transactions: int = 100_000,
+    days: int = 365,
+    seed: int = 0,
+    password: str = "test",
+    batch_size: int = 10_000,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Bulk-loads users, beverages and a time-distributed purchase/deposit history.
+    All users share one precomputed password hash; balances match the confirmed transactions.
+    Returns the number of inserted rows per table.
+    """
+    rng = random.Random(seed)
+    start = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    migrate(engine)
+    hashed_password = hash_password(password)
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        offset = conn.execute(select(func.coalesce(func.max(User.id), 0))).scalar()
+        user_count = _insert_batched(
+            conn,
+            User.__table__,
+            (
+                {
+                    "email": f"user{offset + n:07d}@example.com",
+                    "hashed_password": hashed_password,
+                    "balance": 0.0,
+                    "is_admin": False,
+                    "is_active": True,
+                    "created_at": start,
+                }
+                for n in range(1, users + 1)
+            ),
+            batch_size,
+        )
+        user_ids = list(conn.execute(select(User.id).where(User.id > offset)).scalars())
+
+        existing = set(conn.execute(select(Beverage.name)).scalars())
+        beverage_count = _insert_batched(
+            conn,
+            Beverage.__table__,
+            ({"name": name, "price": price, "stock": 100} for name, price in BEVERAGES if name not in existing),
+            batch_size,
+        )
+        beverages = [tuple(row) for row in conn.execute(select(Beverage.id, Beverage.price))]
+
+        balances: Dict[int, float] = defaultdict(float)
+        transaction_count = _insert_batched(
+            conn,
+            Transaction.__table__,
+            _transaction_rows(rng, user_ids, beverages, transactions, start, days, balances),
+            batch_size,
+        )
+        conn.execute(
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam("user_id"))
+            .values(balance=bindparam("new_balance")),
+            [{"user_id": u, "new_balance": round(b, 2)} for u, b in balances.items()],
+        )
+    return {"users": user_count, "beverages": beverage_count, "transactions": transaction_count}
+
+
+def main() -> None:
+    """Command line entry point: ``python -m src.datagen --database-url sqlite:///./scale.db``."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic Matekasse database for scale testing.")
+    parser.add_argument("--database-url", required=True, help="target database, e.g. sqlite:///./scale.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default="test", help="password shared by all generated users")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    setup_logging(fmt="text")
+    engine = create_engine(args.database_url)
+    started = time.perf_counter()
+    counts = generate(
+        engine,
+        users=args.users,
+        transactions=args.transactions,
+        days=args.days,
+        seed=args.seed,
+        password=args.password,
+        batch_size=args.batch_size,
+    )
+    logger.info("Generated %s in %.1f s", counts, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# src/forecast.py
+import math
+import os
+import weakref
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.models import Beverage, Transaction, TransactionType
+
+FORECAST_WINDOW_DAYS = int(os.getenv("FORECAST_WINDOW_DAYS", "28"))
+FORECAST_HALF_LIFE_DAYS = float(os.getenv("FORECAST_HALF_LIFE_DAYS", "7"))
+REORDER_LEAD_TIME_DAYS = float(os.getenv("REORDER_LEAD_TIME_DAYS", "3"))
+REORDER_COVER_DAYS = float(os.getenv("REORDER_COVER_DAYS", "14"))
+
+
+@dataclass(frozen=True)
+class StockForecast:
+    """Consumption rate and reorder suggestion for one beverage."""
+
+    beverage_id: int
+    daily_rate: float
+    days_until_empty: Optional[float]
+    reorder_quantity: int
+
+
+class ConsumptionCache:
+    """
+    Daily purchase counts per beverage (rows) and day (columns) for the forecast window.
+    Only purchases newer than the last seen transaction id are read on each update,
+    already bucketed per day by the database.
+    """
+
+    def __init__(self, window_days: int) -> None:
+        self.window_days = window_days
+        # one column per full day in the window plus today
+        self.counts = np.zeros((0, window_days + 1), dtype=np.int64)
+        self.rows: Dict[int, int] = {}
+        self.last_id = 0
+        self.today: Optional[date] = None
+        self.lock = Lock()
+
+    @property
+    def window_start(self) -> date:
+        return self.today - timedelta(days=self.window_days)
+
+    def _advance_to(self, today: date) -> None:
+        if self.today is not None:
+            shift = (today - self.today).days
+            if shift >= self.counts.shape[1]:
+                self.counts[:] = 0
+            elif shift > 0:
+                self.counts = np.roll(self.counts, -shift, axis=1)
+                self.counts[:, -shift:] = 0
+        self.today = today
+
+    def _row_indices(self, beverage_ids: np.ndarray) -> np.ndarray:
+        for beverage_id in np.unique(beverage_ids).tolist():
+            if beverage_id not in self.rows:
+                self.rows[beverage_id] = len(self.rows)
+        missing = len(self.rows) - self.counts.shape[0]
+        if missing > 0:
+            self.counts = np.vstack([self.counts, np.zeros((missing, self.counts.shape[1]), dtype=np.int64)])
+        return np.array([self.rows[b] for b in beverage_ids.tolist()], dtype=np.intp)
+
+    def update(self, db: Session, today: date) -> None:
+        """Adds all purchases booked since the last update."""
+        self._advance_to(today)
+        max_id = db.execute(select(func.max(Transaction.id))).scalar() or 0
+        if max_id <= self.last_id:
+            return
+        day = func.date(Transaction.timestamp)
+        buckets = db.execute(
+            select(Transaction.beverage_id, day, func.count())
+            .where(
+                Transaction.id > self.last_id,
+                Transaction.id <= max_id,
+                Transaction.type == TransactionType.PURCHASE,
+                Transaction.beverage_id.is_not(None),
+                Transaction.timestamp >= datetime.combine(self.window_start, datetime.min.time()),
+            )
+            .group_by(Transaction.beverage_id, day)
+        ).all()
+        self.last_id = max_id
+        if not buckets:
+            return
+        beverage_ids, days, counts = zip(*buckets)
+        offsets = (np.array(days, dtype="datetime64[D]") - np.datetime64(self.window_start, "D")).astype(np.intp)
+        in_window = (offsets >= 0) & (offsets < self.counts.shape[1])
+        rows = self._row_indices(np.array(beverage_ids, dtype=np.int64))
+        np.add.at(self.counts, (rows[in_window], offsets[in_window]), np.array(counts, dtype=np.int64)[in_window])
+
+    def daily_rates(self, half_life_days: float) -> np.ndarray:
+        """Exponentially weighted purchases per day over the full days of the window."""
+        full_days = self.counts[:, :-1]
+        age = np.arange(self.window_days - 1, -1, -1, dtype=np.float64)
+        weights = 0.5 ** (age / half_life_days)
+        return full_days @ weights / weights.sum()
+
+
+_caches: "weakref.WeakKeyDictionary[Engine, ConsumptionCache]" = weakref.WeakKeyDictionary()
+_caches_lock = Lock()
+
+
+def _cache_for(engine: Engine) -> ConsumptionCache:
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = ConsumptionCache(FORECAST_WINDOW_DAYS)
+        return cache
+
+
+def forecast_stock(db: Session, now: Optional[datetime] = None) -> Dict[int, StockForecast]:
+    """Returns the stock forecast of every beverage, keyed by beverage id."""
+    cache = _cache_for(db.get_bind())
+    beverages = db.execute(select(Beverage.id, Beverage.stock)).all()
+    if not beverages:
+        return {}
+    with cache.lock:
+        cache.update(db, (now or datetime.utcnow()).date())
+        all_rates = cache.daily_rates(FORECAST_HALF_LIFE_DAYS)
+        rows = np.array([cache.rows.get(b, -1) for b, _ in beverages], dtype=np.intp)
+    rates = np.where(rows >= 0, all_rates[rows] if len(all_rates) else 0.0, 0.0)
+    stock = np.array([max(s or 0, 0) for _, s in beverages], dtype=np.float64)
+    days_left = np.divide(stock, rates, out=np.full_like(stock, np.inf), where=rates > 0)
+    reorder = np.maximum(np.ceil(rates * (REORDER_LEAD_TIME_DAYS + REORDER_COVER_DAYS)) - stock, 0).astype(int)
+    return {
+        beverage_id: StockForecast(
+            beverage_id=beverage_id,
+            daily_rate=float(rate),
+            days_until_empty=None if math.isinf(left) else float(left),
+            reorder_quantity=int(quantity),
+        )
+        for (beverage_id, _), rate, left, quantity in zip(beverages, rates.tolist(), days_left.tolist(), reorder.tolist())
+    }
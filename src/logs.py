@@ -0,0 +1,181 @@
+# src/logs.py
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "10000"))
+
+audit_logger = logging.getLogger("matekasse.audit")
+
+# Attributes every LogRecord has; everything else was passed via ``extra``.
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_traceback_formatter = logging.Formatter()
+
+_listeners: List[QueueListener] = []
+_handler: Optional["BoundedQueueHandler"] = None
+
+# Returns the tenant of the page that is logging, None outside a page
+_tenant_resolver: Optional[Callable[[], Optional[str]]] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line, including all ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class TenantFilter(logging.Filter):
+    """Adds the tenant of the current page to records that do not name one themselves."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if "tenant" not in record.__dict__ and _tenant_resolver is not None:
+            tenant = _tenant_resolver()
+            if tenant is not None:
+                record.tenant = tenant
+        return True
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    Queue handler that keeps records structured. The stdlib version formats the record into
+    ``msg`` and drops ``exc_info``; here only the traceback is rendered to ``exc_text`` up front.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            # tracebacks hold frames that must not be kept alive in the queue
+            record.exc_info = None
+        return record
+
+
+class BoundedQueueHandler(StructuredQueueHandler):
+    """Hands records to a bounded queue and counts the ones dropped when it is full."""
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BlockingQueueHandler(StructuredQueueHandler):
+    """Queue handler that never drops records, used for the audit log."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)
+
+
+def _stop_listeners() -> None:
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    buffer_size: int = LOG_BUFFER_SIZE,
+    audit_file: Optional[str] = None,
+) -> None:
+    """
+    Routes all log records through a queue to a background thread.
+    Handlers on the event loop only enqueue, so logging adds no I/O to page handlers.
+    With ``audit_file`` every balance-changing event is appended there as JSON.
+    Calling it again is a no-op.
+    """
+    global _handler
+    if _handler is not None:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    _handler = BoundedQueueHandler(buffer_size)
+    _handler.addFilter(TenantFilter())
+    _listeners.append(QueueListener(_handler.queue, stream, respect_handler_level=True))
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level if level in LOG_LEVELS else "INFO")
+
+    if audit_file:
+        audit_handler = BlockingQueueHandler(queue.Queue())
+        audit_handler.addFilter(TenantFilter())
+        file_handler = logging.FileHandler(audit_file, mode="a", encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        _listeners.append(QueueListener(audit_handler.queue, file_handler))
+        audit_logger.addHandler(audit_handler)
+        audit_logger.setLevel(logging.INFO)
+
+    for listener in _listeners:
+        listener.start()
+    atexit.register(_stop_listeners)
+
+
+def set_tenant_resolver(resolver: Callable[[], Optional[str]]) -> None:
+    """Lets log and audit records carry the tenant ``resolver`` returns for the calling page."""
+    global _tenant_resolver
+    _tenant_resolver = resolver
+
+
+def setup_logging_from_env() -> None:
+    """Configures logging from LOG_LEVEL, LOG_FORMAT and AUDIT_LOG_FILE."""
+    setup_logging(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        fmt=os.getenv("LOG_FORMAT", "json").lower(),
+        audit_file=os.getenv("AUDIT_LOG_FILE") or None,
+    )
+
+
+def logging_stats() -> Dict[str, int]:
+    """Returns the queue fill level and the number of dropped records."""
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+
+@contextmanager
+def log_action(logger: logging.Logger, action: str, **fields: Any) -> Iterator[None]:
+    """Logs ``action`` with its duration once the block finishes."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("%s finished", action, extra={"action": action, "duration_ms": duration_ms, **fields})
+
+
+def audit(event: str, **fields: Any) -> None:
+    """Records a balance-changing event in the audit log."""
+    audit_logger.info(event, extra={"action": event, **fields})
@@ -1,64 +1,108 @@
 # main.py
+import time
+
+STARTUP_STARTED = time.perf_counter()
+
 import logging
 import os
+import secrets
 from typing import Optional, Generator
 
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from fastapi.security import HTTPBasic
 from nicegui import app, ui
 from sqlalchemy.orm import Session
 
-from src.components.form import form
-from src.database import SessionLocal, engine
+from src.clients import CLIENT_IDLE_TIMEOUT_MINUTES, client_tracker, evict_idle_clients
+from src.components.form import form, min_value, numeric, required
+from src.logs import log_action, logging_stats, set_tenant_resolver, setup_logging_from_env
+from src.database import (
+    DEFAULT_TENANT,
+    engine,
+    get_sessionmaker,
+    is_tenant,
+    statement_cache,
+    tenant_engines,
+)
+from src.maintenance import HOUR, Scheduler, build_scheduler
+from src.migrations import migrate
 from src.models import (
-    Base,
     TransactionStatus,
     TransactionType,
     User,
-    Beverage,
-    Transaction,
 )
+from src.projections import BeverageRow, TransactionRow, list_beverage_rows, transaction_history_rows
 from src.services import (
     authenticate_user,
-    confirm_transaction,
-    create_beverage,
     create_transaction,
     create_user,
-    get_all_pending_transactions,
-    get_transactions_for_user,
     get_user,
     get_user_by_email,
-    list_beverages,
-    list_users,
-    update_beverage,
-    update_user_balance,
+    purchase_beverage,
 )
+from src.sessions import session_backend
 
 security = HTTPBasic()
 
+HISTORY_PAGE_SIZE = 50
+# Production runs without the file-watching reloader; set RELOAD=true while developing
+RELOAD = os.getenv("RELOAD", "false").lower() in ("1", "true", "yes")
+# /status is only served to requests sending this value in the X-Status-Token header
+STATUS_TOKEN = os.getenv("STATUS_TOKEN", "")
+
 
 # Logger setup
 logger = logging.getLogger("matekasse")
-log_level = os.getenv("LOG_LEVEL", "INFO").upper()
-if log_level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
-    log_level = "INFO"
-logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(message)s")
+setup_logging_from_env()
+
+
+def resolve_tenant(request: Request) -> str:
+    """Return the tenant from the ``tenant`` query parameter, remembered in the session cookie."""
+    tenant = request.query_params.get("tenant")
+    if tenant and is_tenant(tenant):
+        request.session["tenant"] = tenant
+        return tenant
+    tenant = request.session.get("tenant", DEFAULT_TENANT)
+    return tenant if is_tenant(tenant) else DEFAULT_TENANT
 
 
 # Dependency
-def get_db() -> Generator[Session, None, None]:
-    """Yield a database session for dependency injection."""
-    db: Session = SessionLocal()
+def get_db(request: Request) -> Generator[Session, None, None]:
+    """Yield a database session of the request's tenant for dependency injection."""
+    db: Session = get_sessionmaker(resolve_tenant(request))()
+    # kept with the page's client so idle eviction can close it
+    request.state.db = db
     try:
         yield db
     finally:
         db.close()
 
 
+def current_tenant() -> str:
+    """Return the tenant of the current page."""
+    return app.storage.browser.get("tenant", DEFAULT_TENANT)
+
+
+def page_tenant() -> Optional[str]:
+    """Return the tenant of the current page, or None outside a page (e.g. in maintenance jobs)."""
+    try:
+        return current_tenant()
+    except RuntimeError:
+        return None
+
+
+set_tenant_resolver(page_tenant)
+
+
+def session_token() -> str:
+    """Return the id of the browser session for the current tenant."""
+    return f"{current_tenant()}:{app.storage.browser['id']}"
+
+
 def get_current_user(db: Session) -> Optional[User]:
-    """Return the currently logged-in user from session storage, or None if not logged in."""
-    user_id = app.storage.user.get("user_id")
+    """Return the currently logged-in user from the session backend, or None if not logged in."""
+    user_id = session_backend.get(session_token())
     if not user_id:
         return None
     return get_user(db, user_id)
@@ -68,34 +112,42 @@ def get_current_user(db: Session) -> Optional[User]:
 def login_page(db: Session = Depends(get_db)) -> None:
     """Render the login page and handle user authentication."""
     def handle_submit(email: str, password: str) -> None:
-        logger.info("Login attempt for %s", email)
-        user = authenticate_user(db, email, password)
+        fields = {"page": "/login", "action": "login"}
+        logger.info("Login attempt for %s", email, extra=fields)
+        with log_action(logger, "login", page="/login"):
+            user = authenticate_user(db, email, password)
         if user:
-            logger.info("Login success for %s, user_id %s", email, user.id)
-            app.storage.user["user_id"] = user.id
+            logger.info("Login success for %s, user_id %s", email, user.id, extra={**fields, "user_id": user.id})
+            session_backend.set(session_token(), user.id)
             ui.navigate.to("/shop")
         else:
-            logger.warning("Login failed for %s", email)
+            logger.warning("Login failed for %s", email, extra=fields)
             ui.notify("Login failed", color="negative")
-    ui.label("Matekasse").classes("text-h4 mt-16 mb-4 mx-auto ")
-    with form(on_submit=handle_submit).classes("mx-auto") as f:
+    tenant = current_tenant()
+    title = "Matekasse" if tenant == DEFAULT_TENANT else f"Matekasse · {tenant}"
+    ui.label(title).classes("text-h4 mt-16 mb-4 mx-auto ")
+    rules = {"email": [required()], "password": [required()]}
+    with form(on_submit=handle_submit, rules=rules).classes("mx-auto") as f:
         ui.input("E-Mail").props("key=email type=email").mark("E-Mail")
-        ui.input("Password", password=True,password_toggle_button=True).props("key=password type=password").mark(
+        password = ui.input("Password", password=True,password_toggle_button=True).props("key=password type=password").mark(
             "Password"
-        ).on("keydown.enter", f.submit)
+        )
+        f.submit_on(password, "keydown.enter")
         f.create_submit_button("Login", icon="login", color="primary").mark("Login")
 
 
 @ui.page("/logout")
 def logout_page() -> None:
     """Log out the current user and redirect to the login page."""
-    logger.info("Logout for user %s", app.storage.user.get("user_id"))
-    app.storage.user.pop("user_id", None)
+    user_id = session_backend.get(session_token())
+    logger.info("Logout for user %s", user_id, extra={"user_id": user_id, "page": "/logout", "action": "logout"})
+    session_backend.delete(session_token())
     ui.navigate.to("/login")
 
 
 def user_header(user: User, current_path: str) -> None:
     """Render the fixed header with user info and navigation buttons, highlighting the active route."""
+    client_tracker.watch()
     def nav_button(label: str, route_path: str, mark_name: str) -> None:
         is_active = current_path == route_path
         base_classes = "font-medium border border-blue-700 rounded px-4 py-2 hover:bg-blue-100 transition"
@@ -120,37 +172,31 @@ def user_header(user: User, current_path: str) -> None:
             nav_button("Transactions", "/transactions", "Transaktionen")
             if user.is_admin:
                 nav_button("Admin", "/admin", "Admin")
+                nav_button("Ledger", "/admin/ledger", "Ledger")
             nav_button("Logout", "/logout", "Logout")
     ui.space().classes("h-20 block")  # Spacer to push content below fixed header
 
 
-def render_beverage_row(user: User, db: Session, beverage: Beverage) -> None:
+def render_beverage_row(user: User, db: Session, beverage: BeverageRow) -> None:
     """Render a row for a beverage with a buy button."""
     with ui.row():
-        ui.label(f"{beverage.name} ({beverage.price:.2f} €) - Stock: {beverage.stock}")
+        ui.label(f"{beverage.name} ({beverage.price_text}) - Stock: {beverage.stock}")
 
-        def make_buy_handler(bev):
+        def make_buy_handler(user_id: int, beverage_id: int, name: str):
             def buy():
-                if user.balance < bev.price:
-                    ui.notify("Not enough balance", color="negative")
-                    return
-                if bev.stock <= 0:
-                    ui.notify("Out of stock", color="negative")
+                # balance and stock are checked against the database, not the rendered row
+                try:
+                    with log_action(logger, "purchase", page="/shop", user_id=user_id, beverage_id=beverage_id):
+                        purchase_beverage(db, user_id, beverage_id)
+                except HTTPException as e:
+                    ui.notify(e.detail, color="negative")
                     return
-                create_transaction(
-                    db,
-                    user.id,
-                    -bev.price,
-                    TransactionType.PURCHASE,
-                    TransactionStatus.CONFIRMED,
-                )
-                update_beverage(db, bev.id, stock=bev.stock - 1)
-                ui.notify(f"{bev.name} purchased!")
+                ui.notify(f"{name} purchased!")
                 ui.navigate.to("/shop")
 
             return buy
 
-        ui.button("Buy", on_click=make_buy_handler(beverage)).mark("Kaufen")
+        ui.button("Buy", on_click=make_buy_handler(user.id, beverage.id, beverage.name)).mark("Kaufen")
 
 
 def render_deposit_form(user: User, db: Session) -> None:
@@ -160,24 +206,41 @@ def render_deposit_form(user: User, db: Session) -> None:
             amount = float(amount)
             if amount <= 0:
                 raise ValueError
-            create_transaction(
-                db, user.id, amount, TransactionType.DEPOSIT, TransactionStatus.PENDING
-            )
-            ui.notify("Deposit recorded. Waiting for admin confirmation.")
+            with log_action(logger, "deposit", page="/shop", user_id=user.id):
+                deposit = create_transaction(
+                    db, user.id, amount, TransactionType.DEPOSIT, TransactionStatus.PENDING
+                )
+            reference_label.set_text(f"Transfer {amount:.2f} € with reference {deposit.reference}")
+            ui.notify(f"Deposit recorded. Use reference {deposit.reference} in your bank transfer.")
         except Exception as e:
-            logger.error("Error processing deposit: %s", e)
+            logger.error("Error processing deposit: %s", e, extra={"page": "/shop", "action": "deposit", "user_id": user.id})
             ui.notify("Invalid amount", color="negative")
 
-    with form(on_submit=handle_deposit) as f:
+    rules = {"amount": [required(), numeric(), min_value(0.01)]}
+    with form(on_submit=handle_deposit, rules=rules) as f:
         ui.label("Deposit").classes("text-h5")
         ui.input("Amount (€)").props("key=amount type=number").mark("Betrag (€)")
+        # the code matches the bank transfer to this deposit in the statement import
+        reference_label = ui.label().classes("text-bold").mark("Verwendungszweck")
         f.create_submit_button("Deposit", icon="add", color="primary").mark("Einzahlen")
 
 
-def render_transaction_table(transactions: list[Transaction]) -> None:
+def transaction_table_row(t: TransactionRow) -> dict:
+    """Format a transaction for the history table."""
+    return {
+        "id": t.id,
+        "date": t.date_text,
+        "type": t.type.value,
+        "amount": t.amount_text,
+        "status": t.status.value,
+        "reference": t.reference or "",
+    }
+
+
+def render_transaction_table(transactions: list[TransactionRow]) -> ui.table:
     """Render the transaction history table for the user."""
     ui.label("Transaction History").classes("text-h5")
-    ui.table(
+    return ui.table(
         columns=[
             {"name": "date", "label": "Date", "field": "date", "sortable": True},
             {"name": "type", "label": "Type", "field": "type", "sortable": True},
@@ -189,137 +252,13 @@ def render_transaction_table(transactions: list[Transaction]) -> None:
                 "align": "left",
             },
             {"name": "status", "label": "Status", "field": "status", "sortable": True},
+            {"name": "reference", "label": "Reference", "field": "reference"},
         ],
-        rows=[
-            {
-                "date": t.timestamp.strftime("%Y-%m-%d %H:%M"),
-                "type": t.type.value,
-                "amount": f"{t.amount:.2f}",
-                "status": t.status.value,
-            }
-            for t in transactions
-        ],
+        rows=[transaction_table_row(t) for t in transactions],
+        row_key="id",
     )
 
 
-def render_user_row(db: Session, u: User) -> None:
-    """Render a row for a user in the admin user management section."""
-    with ui.row():
-        ui.label(f"{u.email} ")
-        ui.label(f"Balance: {u.balance:.2f} € ")
-        ui.label(f"Admin: {u.is_admin}")
-
-        def make_balance_handler(user_id):
-            def set_balance():
-                def submit_balance(new_balance):
-                    try:
-                        update_user_balance(db, user_id, float(new_balance))
-                        ui.notify("Balance updated")
-                        ui.navigate.to("/admin")
-                    except Exception:
-                        ui.notify("Error updating balance", color="negative")
-
-                with form(on_submit=submit_balance) as f:
-                    ui.input("New balance").props("key=new_balance type=number").mark(
-                        "Neues Guthaben"
-                    )
-                    f.create_submit_button("Save", icon="save").mark("Speichern")
-
-            return set_balance
-
-        ui.button("Edit balance", on_click=make_balance_handler(u.id)).mark(
-            "Guthaben ändern"
-        )
-
-
-def render_create_user_form(db: Session) -> None:
-    """Render the form for admins to create a new user."""
-    def handle_create_user(email, password, is_admin):
-        try:
-            create_user(db, email, password, bool(is_admin))
-            logger.info("Admin created user %s (admin=%s)", email, is_admin)
-            ui.notify("User created")
-        except Exception as e:
-            logger.error("Error creating user %s: %s", email, e)
-            ui.notify(str(e), color="negative")
-
-    with form(on_submit=handle_create_user) as f:
-        ui.input("E-Mail").props("key=email type=email").mark("E-Mail")
-        ui.input("Password", password=True).props("key=password type=password").mark(
-            "Passwort"
-        )
-        ui.checkbox("Admin").props("key=is_admin").mark("Admin-Checkbox")
-        f.create_submit_button("Create user", icon="person_add").mark("Nutzer anlegen")
-
-
-def render_beverage_admin_row(db: Session, b: Beverage) -> None:
-    """Render a row for a beverage in the admin beverage management section."""
-    with ui.row():
-        ui.label(f"{b.name} | Price: {b.price:.2f} € | Stock: {b.stock}")
-
-        def make_stock_handler(bev_id):
-            def set_stock():
-                def submit_stock(new_stock):
-                    try:
-                        update_beverage(db, bev_id, stock=int(new_stock))
-                        ui.notify("Stock updated")
-                        ui.navigate.to("/admin")
-                    except Exception:
-                        ui.notify("Error updating stock", color="negative")
-
-                with form(on_submit=submit_stock) as f:
-                    ui.input("New stock").props("key=new_stock type=number").mark(
-                        "Neuer Lagerbestand"
-                    )
-                    f.create_submit_button("Save", icon="save").mark("Speichern")
-
-            return set_stock
-
-        ui.button("Edit stock", on_click=make_stock_handler(b.id)).mark("Lager ändern")
-
-
-def render_create_beverage_form(db: Session) -> None:
-    """Render the form for admins to create a new beverage."""
-    def handle_create_beverage(name, price, stock):
-        try:
-            create_beverage(db, name, float(price), int(stock))
-            logger.info(
-                "Admin created beverage %s (price=%s, stock=%s)", name, price, stock
-            )
-            ui.navigate.to("/admin")
-            ui.notify("Beverage created")
-        except Exception as e:
-            logger.error("Error creating beverage %s: %s", name, e)
-            ui.notify(str(e), color="negative")
-
-    with form(on_submit=handle_create_beverage) as f:
-        ui.input("Name").props("key=name").mark("Name")
-        ui.input("Price (€)").props("key=price type=number").mark("Preis (€)")
-        ui.input("Stock").props("key=stock type=number").mark("Neu in Lager")
-        f.create_submit_button("Create beverage", icon="add").mark("Getränk anlegen")
-
-
-def render_pending_transaction_row(db: Session, t: Transaction) -> None:
-    """Render a row for a pending deposit transaction with a confirm button."""
-    with ui.row():
-        ui.label(
-            f"{t.id} | User: {t.user_id} | Amount: {t.amount:.2f} € | {t.timestamp.strftime('%Y-%m-%d %H:%M')}"
-        )
-
-        def make_confirm_handler(tid):
-            def confirm():
-                try:
-                    confirm_transaction(db, tid)
-                    ui.notify("Deposit confirmed")
-                    ui.navigate.to("/admin")
-                except Exception as e:
-                    ui.notify(str(e), color="negative")
-
-            return confirm
-
-        ui.button("Confirm", on_click=make_confirm_handler(t.id)).mark("Bestätigen")
-
-
 @ui.page("/shop")
 def purchase_page(db: Session = Depends(get_db)) -> None:
     """Render the shop page for purchasing beverages and making deposits."""
@@ -327,7 +266,7 @@ def purchase_page(db: Session = Depends(get_db)) -> None:
     if not user:
         return RedirectResponse(url="/login")
     user_header(user, "/shop")
-    beverages = list_beverages(db)
+    beverages = list_beverage_rows(db)
     with ui.card():
         ui.label("Buy Beverage").classes("text-h5")
         for beverage in beverages:
@@ -337,13 +276,28 @@ def purchase_page(db: Session = Depends(get_db)) -> None:
 
 @ui.page("/transactions")
 def transactions_page(db: Session = Depends(get_db)) -> None:
-    """Render the user's transaction history page."""
+    """Render the user's transaction history page, loading older pages on demand."""
     user = get_current_user(db)
     if not user:
         return RedirectResponse(url="/login")
     user_header(user, "/transactions")
-    transactions = get_transactions_for_user(db, user.id)
-    render_transaction_table(transactions)
+    transactions = transaction_history_rows(db, user.id, limit=HISTORY_PAGE_SIZE)
+    table = render_transaction_table(transactions)
+    cursor = (transactions[-1].timestamp, transactions[-1].id) if transactions else None
+
+    def load_older():
+        nonlocal cursor
+        older = transaction_history_rows(
+            db, user.id, before=cursor, limit=HISTORY_PAGE_SIZE
+        )
+        if older:
+            table.add_rows([transaction_table_row(t) for t in older])
+            cursor = (older[-1].timestamp, older[-1].id)
+        if len(older) < HISTORY_PAGE_SIZE:
+            load_button.set_visibility(False)
+
+    load_button = ui.button("Load older", on_click=load_older).mark("Ältere laden")
+    load_button.set_visibility(len(transactions) == HISTORY_PAGE_SIZE)
 
 
 @ui.page("/admin")
@@ -354,36 +308,70 @@ def admin_page(db: Session = Depends(get_db)) -> None:
         return RedirectResponse(url="/login")
     user_header(user, "/admin")
     ui.label("Admin Panel").classes("text-h5")
+    from src.admin import render_admin_panel
 
-    # Einzahlungen bestätigen
-    ui.label("Open Transactions").classes("text-h6")
-    pending = get_all_pending_transactions(db)
-    for t in pending:
-        render_pending_transaction_row(db, t)
-    # Nutzerverwaltung
-    ui.label("User Management").classes("text-h6")
-    users = list_users(db)
-    for u in users:
-        render_user_row(db, u)
-    render_create_user_form(db)
-    # Getränkeverwaltung
-    ui.label("Beverage Management").classes("text-h6")
-    beverages = list_beverages(db)
-    for b in beverages:
-        render_beverage_admin_row(db, b)
-    render_create_beverage_form(db)
+    render_admin_panel(db)
 
+scheduler: Scheduler = Scheduler()
 
-def main() -> None:
-    """Initialize the database and run the NiceGUI application."""
-    Base.metadata.create_all(bind=engine)
+
+@app.get("/status")
+def status(x_status_token: Optional[str] = Header(default=None)) -> dict:
+    """Expose background job run times and per-client page sizes to monitoring holding STATUS_TOKEN."""
+    if not STATUS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest((x_status_token or "").encode(), STATUS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid status token")
+    return {
+        "jobs": scheduler.status(),
+        "logging": logging_stats(),
+        "tenants": {"open_engines": tenant_engines.stats()},
+        "clients": client_tracker.stats(),
+        "statement_cache": statement_cache.stats(),
+    }
+
+
+@ui.page("/admin/ledger")
+def ledger_page(user_id: Optional[int] = None, db: Session = Depends(get_db)) -> None:
+    """Render the admin view of all users' transactions."""
+    user = get_current_user(db)
+    if not user or not user.is_admin:
+        return RedirectResponse(url="/login")
+    user_header(user, "/admin/ledger")
+    ui.label("Ledger").classes("text-h5")
+    from src.admin import render_ledger
+
+    render_ledger(db, user_id)
+
+
+def prepare_database(db_engine) -> None:
+    """Migrate the schema of a tenant database and create its initial admin."""
+    migrate(db_engine)
     # Testnutzer/Admin anlegen, falls nicht vorhanden
-    with SessionLocal() as db:
+    with Session(db_engine) as db:
         admin_email = os.getenv("INITIAL_ADMIN_USER","admin@matekasse.de")
         admin_pw = os.getenv("INITIAL_ADMIN_PASSWORD","admin")
         if not get_user_by_email(db, admin_email):
             create_user(db, admin_email, admin_pw, is_admin=True)
-    ui.run(storage_secret=os.getenv("STORAGE_KEY","some_string_to_encrypt_some_session_data_could_even_be_random"), reload=True)
+
+
+tenant_engines.on_open = prepare_database
+
+
+def main() -> None:
+    """Initialize the database, start maintenance jobs and run the NiceGUI application."""
+    global scheduler
+    prepare_database(engine)
+    scheduler = build_scheduler()
+    scheduler.add_job("purge_sessions", HOUR, session_backend.purge_expired)
+    if CLIENT_IDLE_TIMEOUT_MINUTES > 0:
+        scheduler.add_job("evict_idle_clients", 60.0, evict_idle_clients)
+    app.on_startup(scheduler.start)
+    app.on_shutdown(scheduler.stop)
+    app.on_startup(
+        lambda: logger.info("Startup took %.2f s", time.perf_counter() - STARTUP_STARTED, extra={"action": "startup"})
+    )
+    ui.run(storage_secret=os.getenv("STORAGE_KEY","some_string_to_encrypt_some_session_data_could_even_be_random"), reload=RELOAD)
 
 
 if __name__ in {"__main__", "__mp_main__"}:
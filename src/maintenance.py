@@ -0,0 +1,257 @@
+# src/maintenance.py
+import argparse
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.engine import Engine
+
+from src import database
+from src.archive import run_archive_job
+from src.logs import setup_logging
+
+logger = logging.getLogger("matekasse")
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "./backups")
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "6"))
+BACKUP_RETENTION = int(os.getenv("BACKUP_RETENTION", "14"))
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.05"))
+VACUUM_PAGES_PER_RUN = 500
+
+HOUR = 3600.0
+
+
+@dataclass
+class Job:
+    """A blocking maintenance function that is run periodically in a worker thread."""
+
+    name: str
+    interval: float
+    func: Callable[[], Any]
+    initial_delay: float = 60.0
+    runs: int = 0
+    failures: int = 0
+    last_started: Optional[datetime] = None
+    last_finished: Optional[datetime] = None
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+    next_run: Optional[datetime] = None
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the run times of the job for monitoring."""
+        def iso(value: Optional[datetime]) -> Optional[str]:
+            return value.isoformat() if value else None
+
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started": iso(self.last_started),
+            "last_finished": iso(self.last_finished),
+            "last_duration_seconds": self.last_duration,
+            "last_error": self.last_error,
+            "next_run": iso(self.next_run),
+        }
+
+
+class Scheduler:
+    """Runs maintenance jobs on the event loop without blocking page handlers."""
+
+    def __init__(self) -> None:
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, interval: float, func: Callable[[], Any], initial_delay: float = 60.0) -> Job:
+        """Registers a job that runs every ``interval`` seconds."""
+        job = Job(name=name, interval=interval, func=func, initial_delay=initial_delay)
+        self.jobs[name] = job
+        return job
+
+    async def run_job(self, job: Job) -> None:
+        """Runs a job once in a worker thread (coroutines on the event loop) and records its run times."""
+        job.last_started = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(job.func):
+                await job.func()
+            else:
+                await asyncio.to_thread(job.func)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            logger.error("Maintenance job %s failed: %s", job.name, e)
+        finally:
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.last_finished = datetime.utcnow()
+
+    async def _run_forever(self, job: Job) -> None:
+        delay = job.initial_delay
+        while True:
+            job.next_run = datetime.utcnow() + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+            await self.run_job(job)
+            delay = job.interval
+
+    def start(self) -> None:
+        """Starts one background task per job; call from the app's startup hook."""
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._run_forever(job), name=f"maintenance:{job.name}"))
+
+    async def stop(self) -> None:
+        """Cancels all job tasks; call from the app's shutdown hook."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the run times of all jobs for monitoring."""
+        return {name: job.status() for name, job in self.jobs.items()}
+
+
+def backup_database(
+    engine: Engine,
+    target_dir: str = BACKUP_DIR,
+    retention: int = BACKUP_RETENTION,
+    pages_per_step: int = BACKUP_PAGES_PER_STEP,
+    step_sleep: float = BACKUP_STEP_SLEEP,
+) -> Path:
+    """
+    Writes an online backup of a SQLite database through the sqlite3 backup API.
+    The copy is done in small page steps so writers are only blocked briefly.
+    Only the newest ``retention`` backups are kept.
+    """
+    directory = Path(target_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = Path(engine.url.database or "memory").stem or "memory"
+    target = directory / f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.db"
+    partial = target.with_suffix(".db.part")
+    raw = engine.raw_connection()
+    try:
+        destination = sqlite3.connect(partial)
+        try:
+            raw.driver_connection.backup(destination, pages=pages_per_step, sleep=step_sleep)
+            # keep the copy a single self-contained file
+            destination.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            destination.close()
+    finally:
+        raw.close()
+    partial.replace(target)
+    # tenant names may contain "-", so "kitchen-*" alone would also match kitchen-2's backups
+    stamped = re.compile(rf"{re.escape(name)}-\d{{8}}-\d{{6}}\.db")
+    backups = sorted(path for path in directory.glob(f"{name}-*.db") if stamped.fullmatch(path.name))
+    for old in backups[:-retention] if retention > 0 else []:
+        old.unlink()
+    logger.info("Database backup written to %s", target)
+    return target
+
+
+def _run_pragma(engine: Engine, statement: str) -> None:
+    with engine.connect() as conn:
+        conn.exec_driver_sql(statement)
+        conn.commit()
+
+
+def optimize(engine: Engine) -> None:
+    """Lets SQLite refresh the statistics it considers stale."""
+    _run_pragma(engine, "PRAGMA optimize")
+
+
+def analyze(engine: Engine) -> None:
+    """Rebuilds the query planner statistics for all tables and indexes."""
+    _run_pragma(engine, "ANALYZE")
+
+
+def checkpoint_wal(engine: Engine) -> None:
+    """Copies the write-ahead log back into the database file and truncates it."""
+    _run_pragma(engine, "PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def incremental_vacuum(engine: Engine, pages: int = VACUUM_PAGES_PER_RUN) -> None:
+    """
+    Returns up to ``pages`` free pages to the file system. Databases created before
+    auto_vacuum=INCREMENTAL was set are skipped; see ``enable_incremental_vacuum``.
+    """
+    with engine.connect() as conn:
+        # 2 = INCREMENTAL
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            logger.warning(
+                "Skipping incremental vacuum of %s: run python -m src.maintenance --enable-incremental-vacuum",
+                engine.url.database,
+            )
+            return
+    _run_pragma(engine, f"PRAGMA incremental_vacuum({int(pages)})")
+
+
+def enable_incremental_vacuum(engine: Engine) -> bool:
+    """
+    Switches an existing database to auto_vacuum=INCREMENTAL with a full VACUUM.
+    The VACUUM holds the write lock for the whole rebuild, so run it in a maintenance window.
+    Returns False if the database was already incremental.
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return False
+        logger.info("Switching %s to incremental auto_vacuum", engine.url.database)
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        # VACUUM cannot run inside a transaction
+        conn.connection.driver_connection.execute("VACUUM")
+    return True
+
+
+def for_each_sqlite_engine(func: Callable[[Engine], Any], include_idle: bool = False) -> Callable[[], None]:
+    """
+    Wraps ``func`` into a job that runs it for the database of every tenant.
+    Without ``include_idle`` only tenants with an open engine are visited.
+    """
+    def run() -> None:
+        for tenant, engine in database.iter_engines(include_idle=include_idle):
+            if engine.dialect.name == "sqlite":
+                func(engine)
+    return run
+
+
+def build_scheduler() -> Scheduler:
+    """Creates the scheduler with the default maintenance jobs for all tenant databases."""
+    scheduler = Scheduler()
+    scheduler.add_job("backup", BACKUP_INTERVAL_HOURS * HOUR, for_each_sqlite_engine(backup_database, include_idle=True))
+    scheduler.add_job("wal_checkpoint", 0.25 * HOUR, for_each_sqlite_engine(checkpoint_wal))
+    scheduler.add_job("optimize", 6 * HOUR, for_each_sqlite_engine(optimize))
+    scheduler.add_job("analyze", 7 * 24 * HOUR, for_each_sqlite_engine(analyze), initial_delay=HOUR)
+    scheduler.add_job("incremental_vacuum", 24 * HOUR, for_each_sqlite_engine(incremental_vacuum), initial_delay=HOUR)
+    scheduler.add_job("archive", 24 * HOUR, run_archive_job, initial_delay=HOUR)
+    scheduler.add_job(
+        "evict_idle_tenants", 60.0, lambda: database.tenant_engines.evict_idle(database.TENANT_IDLE_MINUTES * 60)
+    )
+    return scheduler
+
+
+def main() -> None:
+    """Command line entry point: ``python -m src.maintenance --enable-incremental-vacuum``."""
+    parser = argparse.ArgumentParser(description="One-off database maintenance.")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="switch all tenant databases to incremental auto_vacuum (full VACUUM, blocks writers)",
+    )
+    args = parser.parse_args()
+    setup_logging(fmt="text")
+    if args.enable_incremental_vacuum:
+        for_each_sqlite_engine(enable_incremental_vacuum, include_idle=True)()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
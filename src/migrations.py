@@ -0,0 +1,135 @@
+# src/migrations.py
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from src.models import Base
+
+logger = logging.getLogger("matekasse")
+
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One schema change; ``upgrade`` must be idempotent for databases created before versioning."""
+
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _baseline(conn: Connection) -> None:
+    # creates missing tables with their current columns and indexes, existing tables are left alone
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_beverage_columns(conn: Connection) -> None:
+    inspector = inspect(conn)
+    for table in ("transactions", "transactions_archive"):
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "beverage_id" not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN beverage_id INTEGER")
+
+
+def _transaction_indexes(conn: Connection) -> None:
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_transactions_user_timestamp ON transactions (user_id, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_timestamp ON transactions (timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_status_timestamp ON transactions (status, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_type_timestamp ON transactions (type, timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_archive_user_timestamp "
+        "ON transactions_archive (user_id, timestamp, id)",
+        # covered by the composite indexes above
+        "DROP INDEX IF EXISTS ix_transactions_id",
+        "DROP INDEX IF EXISTS ix_transactions_user_id",
+    ):
+        conn.exec_driver_sql(statement)
+
+
+def _add_reference_columns(conn: Connection) -> None:
+    inspector = inspect(conn)
+    for table in ("transactions", "transactions_archive"):
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        if "reference" not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN reference VARCHAR")
+
+
+def _autoincrement_transaction_ids(conn: Connection) -> None:
+    # Plain INTEGER PRIMARY KEY hands out max(id) + 1, so ids come back once every row is
+    # archived. AUTOINCREMENT needs a table rebuild on SQLite; other backends use sequences.
+    if conn.dialect.name != "sqlite":
+        return
+    sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions'").scalar()
+    if "AUTOINCREMENT" not in sql.upper():
+        conn.exec_driver_sql("ALTER TABLE transactions RENAME TO transactions_legacy")
+        # the table as of version 5, spelled out so later model changes do not alter this migration
+        conn.exec_driver_sql(
+            "CREATE TABLE transactions ("
+            "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount FLOAT, type VARCHAR(8), "
+            "status VARCHAR(9), timestamp DATETIME, beverage_id INTEGER, reference VARCHAR)"
+        )
+        columns = "id, user_id, amount, type, status, timestamp, beverage_id, reference"
+        conn.exec_driver_sql(f"INSERT INTO transactions ({columns}) SELECT {columns} FROM transactions_legacy")
+        # dropping the renamed table also drops its indexes, which are recreated on the new one
+        conn.exec_driver_sql("DROP TABLE transactions_legacy")
+        _transaction_indexes(conn)
+    highest = conn.exec_driver_sql(
+        "SELECT max(coalesce((SELECT max(id) FROM transactions), 0), "
+        "coalesce((SELECT max(id) FROM transactions_archive), 0))"
+    ).scalar()
+    # rows that were already handed an archived id move above every id in use
+    conn.exec_driver_sql(
+        "UPDATE transactions SET id = id + ? WHERE id IN (SELECT id FROM transactions_archive)", (highest,)
+    )
+    highest = max(highest, conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM transactions").scalar())
+    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'transactions'")
+    conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', ?)", (highest,))
+
+
+# Ordered by version; append new migrations, never change applied ones
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema", _baseline),
+    Migration(2, "beverage_id on transactions", _add_beverage_columns),
+    Migration(3, "composite transaction indexes", _transaction_indexes),
+    Migration(4, "deposit reference codes", _add_reference_columns),
+    Migration(5, "never reuse transaction ids", _autoincrement_transaction_ids),
+]
+
+
+def current_version(conn: Connection) -> int:
+    """Returns the highest applied migration, 0 for an unversioned database."""
+    schema_version.create(bind=conn, checkfirst=True)
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def migrate(engine: Engine) -> int:
+    """
+    Applies all pending migrations in one transaction and returns how many ran.
+    An up-to-date database costs a table check and a single query.
+    """
+    with engine.begin() as conn:
+        version = current_version(conn)
+        pending = [migration for migration in MIGRATIONS if migration.version > version]
+        for migration in pending:
+            logger.info("Applying migration %s: %s", migration.version, migration.description)
+            migration.upgrade(conn)
+            conn.execute(
+                insert(schema_version).values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied_at=datetime.utcnow(),
+                )
+            )
+    return len(pending)
@@ -1,7 +1,7 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Enum, Float, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Enum, Float, Index, Integer, String
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -50,9 +50,60 @@ class Transaction(Base):
     """Database model for a transaction."""
 
     __tablename__ = "transactions"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
+    # user_id and id are covered by the composite indexes below
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer)
     amount = Column(Float)
     type = Column(Enum(TransactionType))
     status = Column(Enum(TransactionStatus))
     timestamp = Column(DateTime, default=datetime.utcnow)
+    beverage_id = Column(Integer, nullable=True)
+    # code the user puts into the bank transfer of a deposit
+    reference = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_transactions_user_timestamp", "user_id", "timestamp", "id"),
+        Index("ix_transactions_timestamp", "timestamp", "id"),
+        Index("ix_transactions_status_timestamp", "status", "timestamp", "id"),
+        Index("ix_transactions_type_timestamp", "type", "timestamp", "id"),
+        # ids must never be reused once rows have moved into transactions_archive
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ArchivedTransaction(Base):
+    """Database model for a confirmed transaction moved out of the hot table."""
+
+    __tablename__ = "transactions_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer)
+    amount = Column(Float)
+    type = Column(Enum(TransactionType))
+    status = Column(Enum(TransactionStatus))
+    timestamp = Column(DateTime)
+    beverage_id = Column(Integer, nullable=True)
+    reference = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_transactions_archive_user_timestamp", "user_id", "timestamp", "id"),
+    )
+
+
+class BalanceCheckpoint(Base):
+    """Database model for the per-user roll-up of all archived transactions."""
+
+    __tablename__ = "balance_checkpoints"
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    archived_until = Column(DateTime)
+    archived_amount = Column(Float, default=0.0)
+    archived_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LoginSession(Base):
+    """Database model for a login shared between app workers."""
+
+    __tablename__ = "login_sessions"
+    token = Column(String, primary_key=True)
+    user_id = Column(Integer)
+    expires_at = Column(DateTime, index=True)
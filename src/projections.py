@@ -0,0 +1,118 @@
+# src/projections.py
+# Read-only rows for list views: only the displayed columns, formatted once per row
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models import (
+    ArchivedTransaction,
+    Beverage,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+)
+from src.services import history_page, history_reaches_archive
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+
+class UserRow(NamedTuple):
+    """A user as listed in the admin panel."""
+
+    id: int
+    email: str
+    balance: float
+    is_admin: bool
+    balance_text: str
+
+
+class BeverageRow(NamedTuple):
+    """A beverage as listed in the shop and the admin panel."""
+
+    id: int
+    name: str
+    price: float
+    stock: int
+    price_text: str
+
+
+class TransactionRow(NamedTuple):
+    """A transaction as listed in the history and the pending deposits."""
+
+    id: int
+    user_id: int
+    amount: float
+    type: TransactionType
+    status: TransactionStatus
+    timestamp: datetime
+    reference: Optional[str]
+    date_text: str
+    amount_text: str
+
+
+def _user_row(id: int, email: str, balance: Optional[float], is_admin: bool) -> UserRow:
+    balance = balance or 0.0
+    return UserRow(id, email, balance, bool(is_admin), f"{balance:.2f} €")
+
+
+def _beverage_row(id: int, name: str, price: Optional[float], stock: Optional[int]) -> BeverageRow:
+    price = price or 0.0
+    return BeverageRow(id, name, price, stock or 0, f"{price:.2f} €")
+
+
+def _transaction_row(id, user_id, amount, type, status, timestamp, reference) -> TransactionRow:
+    return TransactionRow(
+        id, user_id, amount, type, status, timestamp, reference, timestamp.strftime(DATE_FORMAT), f"{amount:.2f}"
+    )
+
+
+def _transaction_columns(model) -> tuple:
+    return (model.id, model.user_id, model.amount, model.type, model.status, model.timestamp, model.reference)
+
+
+def list_user_rows(db: Session) -> List[UserRow]:
+    """Returns all users."""
+    rows = db.execute(select(User.id, User.email, User.balance, User.is_admin).order_by(User.id))
+    return [_user_row(*row) for row in rows]
+
+
+def list_beverage_rows(db: Session) -> List[BeverageRow]:
+    """Returns all beverages."""
+    rows = db.execute(select(Beverage.id, Beverage.name, Beverage.price, Beverage.stock).order_by(Beverage.id))
+    return [_beverage_row(*row) for row in rows]
+
+
+def pending_transaction_rows(db: Session) -> List[TransactionRow]:
+    """Returns all unconfirmed (pending) transactions."""
+    rows = db.execute(
+        select(*_transaction_columns(Transaction))
+        .where(Transaction.status == TransactionStatus.PENDING)
+        .order_by(Transaction.timestamp, Transaction.id)
+    )
+    return [_transaction_row(*row) for row in rows]
+
+
+def transaction_history_rows(
+    db: Session,
+    user_id: int,
+    before: Optional[tuple[datetime, int]] = None,
+    limit: int = 50,
+) -> List[TransactionRow]:
+    """Returns one page of a user's transactions, newest first, like get_transaction_history."""
+    hot = [
+        _transaction_row(*row)
+        for row in history_page(db, Transaction, user_id, before, limit, _transaction_columns(Transaction))
+    ]
+    if not history_reaches_archive(db, user_id, hot, limit):
+        return hot
+    archived = [
+        _transaction_row(*row)
+        for row in history_page(
+            db, ArchivedTransaction, user_id, before, limit, _transaction_columns(ArchivedTransaction)
+        )
+    ]
+    rows = sorted(hot + archived, key=lambda t: (t.timestamp, t.id), reverse=True)
+    return rows[:limit]
@@ -1,13 +1,49 @@
 # app/services.py
 
+import secrets
+from datetime import datetime
+from typing import Optional
+
 from fastapi import HTTPException
 from passlib.context import CryptContext
+from sqlalchemy import Select, and_, bindparam, func, or_, select
 from sqlalchemy.orm import Session
 
-from src.models import Beverage, Transaction, TransactionStatus, TransactionType, User
+from src.database import session_tenant
+from src.logs import audit
+from src.models import (
+    ArchivedTransaction,
+    BalanceCheckpoint,
+    Beverage,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Deposit reference codes, e.g. MK-7KQ2ZD; no 0/O or 1/I so they survive being typed into a banking app
+REFERENCE_PREFIX = "MK-"
+REFERENCE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+REFERENCE_LENGTH = 6
+
+# Built once with bound parameters, so every call reuses the engine's compiled statement
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email")).limit(1)
+_ALL_USERS = select(User)
+_ALL_BEVERAGES = select(Beverage)
+_USER_TRANSACTIONS = (
+    select(Transaction)
+    .where(Transaction.user_id == bindparam("user_id"))
+    .order_by(Transaction.timestamp.desc())
+)
+_PENDING_TRANSACTIONS = select(Transaction).where(Transaction.status == TransactionStatus.PENDING)
+_PENDING_REFERENCE = (
+    select(Transaction.id)
+    .where(Transaction.reference == bindparam("reference"), Transaction.status == TransactionStatus.PENDING)
+    .limit(1)
+)
+
 
 def hash_password(password: str) -> str:
     """Generates a secure hash for the password."""
@@ -21,7 +57,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def authenticate_user(db: Session, email: str, password: str):
     """Checks login credentials and returns the user or None."""
-    user = db.query(User).filter(User.email == email).first()
+    user = get_user_by_email(db, email)
     if user and verify_password(password, user.hashed_password):
         return user
     return None
@@ -29,18 +65,12 @@ def authenticate_user(db: Session, email: str, password: str):
 
 def get_user_by_email(db: Session, email: str):
     """Loads a user by email address."""
-    return db.query(User).filter(User.email == email).first()
+    return db.execute(_USER_BY_EMAIL, {"email": email}).scalars().first()
 
 
 def get_user(db: Session, user_id: int):
-    """Loads a user by ID."""
-    return (
-        db.query(User)
-        .filter(
-            User.id == user_id,
-        )
-        .first()
-    )
+    """Loads a user by ID, from the session's identity map if already loaded."""
+    return db.get(User, user_id)
 
 
 def is_admin(user: User) -> bool:
@@ -61,7 +91,7 @@ def create_user(db: Session, email: str, password: str, is_admin: bool = False):
 
 def list_users(db: Session):
     """Returns all users."""
-    return db.query(User).all()
+    return db.execute(_ALL_USERS).scalars().all()
 
 
 def update_user_balance(db: Session, user_id: int, new_balance: float):
@@ -69,9 +99,17 @@ def update_user_balance(db: Session, user_id: int, new_balance: float):
     user = get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    old_balance = user.balance
     user.balance = new_balance
     db.commit()
     db.refresh(user)
+    audit(
+        "balance_set",
+        tenant=session_tenant(db),
+        user_id=user_id,
+        old_balance=old_balance,
+        balance=user.balance,
+    )
     return user
 
 
@@ -86,7 +124,7 @@ def create_beverage(db: Session, name: str, price: float, stock: int = 0):
 
 def list_beverages(db: Session):
     """Returns all beverages."""
-    return db.query(Beverage).all()
+    return db.execute(_ALL_BEVERAGES).scalars().all()
 
 
 def update_beverage(
@@ -97,7 +135,7 @@ def update_beverage(
     stock: int = None,
 ):
     """Updates a beverage."""
-    beverage = db.query(Beverage).filter(Beverage.id == beverage_id).first()
+    beverage = db.get(Beverage, beverage_id)
     if not beverage:
         raise HTTPException(status_code=404, detail="Beverage not found")
     if name is not None:
@@ -111,20 +149,42 @@ def update_beverage(
     return beverage
 
 
+def new_reference() -> str:
+    """Generates a short random reference code for a deposit transfer."""
+    return REFERENCE_PREFIX + "".join(secrets.choice(REFERENCE_ALPHABET) for _ in range(REFERENCE_LENGTH))
+
+
+def unused_reference(db: Session) -> str:
+    """Generates a reference code no other pending deposit carries, so a transfer names exactly one deposit."""
+    while True:
+        reference = new_reference()
+        if db.execute(_PENDING_REFERENCE, {"reference": reference}).first() is None:
+            return reference
+
+
 def create_transaction(
     db: Session,
     user_id: int,
     amount: float,
     transaction_type: TransactionType,
     status: TransactionStatus,
+    beverage_id: Optional[int] = None,
 ):
     """
     Creates a new transaction (purchase or deposit).
     - For purchase: amount is negative, beverage_id must be set.
     - For deposit: amount is positive, beverage_id is None.
+    Pending deposits get a reference code for the bank transfer.
     """
     transaction = Transaction(
-        user_id=user_id, amount=amount, type=transaction_type, status=status
+        user_id=user_id,
+        amount=amount,
+        type=transaction_type,
+        status=status,
+        beverage_id=beverage_id,
+        reference=unused_reference(db)
+        if transaction_type == TransactionType.DEPOSIT and status == TransactionStatus.PENDING
+        else None,
     )
     db.add(transaction)
     # Only adjust balance for confirmed transactions
@@ -133,12 +193,47 @@ def create_transaction(
         user.balance += amount
     db.commit()
     db.refresh(transaction)
+    if status == TransactionStatus.CONFIRMED:
+        audit(
+            "transaction_booked",
+            tenant=session_tenant(db),
+            user_id=user_id,
+            transaction_id=transaction.id,
+            type=transaction_type.value,
+            amount=amount,
+            balance=user.balance,
+        )
     return transaction
 
 
+def purchase_beverage(db: Session, user_id: int, beverage_id: int):
+    """
+    Books the purchase of one beverage against the current balance and stock.
+    Raises 400 if the balance is too low or the beverage is out of stock.
+    """
+    # reload both, the page's session may still hold the state from when the shop was rendered
+    user = db.get(User, user_id, populate_existing=True)
+    beverage = db.get(Beverage, beverage_id, populate_existing=True)
+    if not user or not beverage:
+        raise HTTPException(status_code=404, detail="User or beverage not found")
+    if user.balance < beverage.price:
+        raise HTTPException(status_code=400, detail="Not enough balance")
+    if beverage.stock <= 0:
+        raise HTTPException(status_code=400, detail="Out of stock")
+    beverage.stock -= 1
+    return create_transaction(
+        db,
+        user_id,
+        -beverage.price,
+        TransactionType.PURCHASE,
+        TransactionStatus.CONFIRMED,
+        beverage_id=beverage_id,
+    )
+
+
 def confirm_transaction(db: Session, transaction_id: int):
     """Confirms a pending transaction (e.g., deposit by admin)."""
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = db.get(Transaction, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     if transaction.status == TransactionStatus.CONFIRMED:
@@ -149,23 +244,194 @@ def confirm_transaction(db: Session, transaction_id: int):
     user.balance += transaction.amount
     db.commit()
     db.refresh(transaction)
+    audit(
+        "transaction_confirmed",
+        tenant=session_tenant(db),
+        user_id=user.id,
+        transaction_id=transaction.id,
+        type=transaction.type.value,
+        amount=transaction.amount,
+        balance=user.balance,
+    )
     return transaction
 
 
+def confirm_deposits(db: Session, transaction_ids, source: str, chunk_size: int = 500) -> int:
+    """
+    Confirms many pending deposits in one database transaction and returns how many were confirmed.
+    Ids that are unknown, no deposit or already confirmed are skipped.
+    """
+    ids = list(transaction_ids)
+    transactions = []
+    for start in range(0, len(ids), chunk_size):
+        transactions += db.execute(
+            select(Transaction).where(
+                Transaction.id.in_(ids[start:start + chunk_size]),
+                Transaction.type == TransactionType.DEPOSIT,
+                Transaction.status == TransactionStatus.PENDING,
+            )
+        ).scalars().all()
+    user_ids = list({t.user_id for t in transactions})
+    users = {}
+    for start in range(0, len(user_ids), chunk_size):
+        users.update(
+            (user.id, user)
+            for user in db.execute(select(User).where(User.id.in_(user_ids[start:start + chunk_size]))).scalars()
+        )
+    # audit values are taken before the commit expires the objects, with each user's running balance
+    confirmed = []
+    for transaction in transactions:
+        user = users[transaction.user_id]
+        transaction.status = TransactionStatus.CONFIRMED
+        user.balance += transaction.amount
+        confirmed.append((transaction.id, user.id, transaction.amount, user.balance))
+    db.commit()
+    tenant = session_tenant(db)
+    for transaction_id, user_id, amount, balance in confirmed:
+        audit(
+            "transaction_confirmed",
+            tenant=tenant,
+            user_id=user_id,
+            transaction_id=transaction_id,
+            type=TransactionType.DEPOSIT.value,
+            amount=amount,
+            balance=balance,
+            source=source,
+        )
+    return len(transactions)
+
+
 def get_transactions_for_user(db: Session, user_id: int):
     """Returns all transactions of a user, sorted by date."""
-    return (
-        db.query(Transaction)
-        .filter(Transaction.user_id == user_id)
-        .order_by(Transaction.timestamp.desc())
-        .all()
-    )
+    return db.execute(_USER_TRANSACTIONS, {"user_id": user_id}).scalars().all()
+
+
+def history_page(db: Session, model, user_id: int, before, limit: int, columns=None):
+    """
+    Returns one page of a user's transactions from ``model``, newest first.
+    - columns: select only these columns of ``model`` instead of whole ORM instances.
+    """
+    query = select(*columns) if columns is not None else select(model)
+    query = query.where(model.user_id == user_id)
+    if before is not None:
+        before_timestamp, before_id = before
+        query = query.where(
+            or_(
+                model.timestamp < before_timestamp,
+                and_(model.timestamp == before_timestamp, model.id < before_id),
+            )
+        )
+    query = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit)
+    if columns is not None:
+        return db.execute(query).all()
+    return db.execute(query).scalars().all()
+
+
+def history_reaches_archive(db: Session, user_id: int, hot: list, limit: int) -> bool:
+    """Whether a page read from the hot table must be completed from the archive."""
+    checkpoint = db.get(BalanceCheckpoint, user_id)
+    if checkpoint is None:
+        return False
+    return len(hot) < limit or hot[-1].timestamp < checkpoint.archived_until
+
+
+def get_transaction_history(
+    db: Session,
+    user_id: int,
+    before: Optional[tuple[datetime, int]] = None,
+    limit: int = 50,
+):
+    """
+    Returns one page of a user's transactions, newest first.
+    - before: (timestamp, id) of the last row of the previous page.
+    The archive is only read once the page reaches back past the user's checkpoint.
+    """
+    hot = history_page(db, Transaction, user_id, before, limit)
+    if not history_reaches_archive(db, user_id, hot, limit):
+        return hot
+    archived = history_page(db, ArchivedTransaction, user_id, before, limit)
+    rows = sorted(hot + archived, key=lambda t: (t.timestamp, t.id), reverse=True)
+    return rows[:limit]
 
 
 def get_all_pending_transactions(db: Session):
     """Returns all unconfirmed (pending) transactions."""
-    return (
-        db.query(Transaction)
-        .filter(Transaction.status == TransactionStatus.PENDING)
-        .all()
-    )
+    return db.execute(_PENDING_TRANSACTIONS).scalars().all()
+
+
+def search_transactions_query(
+    user_id: Optional[int] = None,
+    email_prefix: Optional[str] = None,
+    transaction_type: Optional[TransactionType] = None,
+    status: Optional[TransactionStatus] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    before: Optional[tuple[datetime, int]] = None,
+    limit: int = 50,
+    model=Transaction,
+) -> Select:
+    """
+    Builds the admin ledger search, newest first.
+    Every filter is a sargable predicate on an indexed column:
+    user -> ix_transactions_user_timestamp, e-mail prefix -> range on the unique e-mail index,
+    type/status -> ix_transactions_type_timestamp / ix_transactions_status_timestamp,
+    dates -> ix_transactions_timestamp. The amount range is checked on the rows found that way.
+    - model: ArchivedTransaction searches the archive, which is only indexed by user.
+    """
+    query = select(model, User.email).join(User, User.id == model.user_id)
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    if email_prefix:
+        # a range instead of LIKE so the e-mail index can be used
+        query = query.where(User.email >= email_prefix, User.email < email_prefix + "\uffff")
+    if transaction_type is not None:
+        query = query.where(model.type == transaction_type)
+    if status is not None:
+        query = query.where(model.status == status)
+    if min_amount is not None:
+        query = query.where(model.amount >= min_amount)
+    if max_amount is not None:
+        query = query.where(model.amount <= max_amount)
+    if date_from is not None:
+        query = query.where(model.timestamp >= date_from)
+    if date_to is not None:
+        query = query.where(model.timestamp < date_to)
+    if before is not None:
+        before_timestamp, before_id = before
+        query = query.where(
+            or_(
+                model.timestamp < before_timestamp,
+                and_(model.timestamp == before_timestamp, model.id < before_id),
+            )
+        )
+    return query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit)
+
+
+def _archived_until(db: Session, user_id: Optional[int]) -> Optional[datetime]:
+    if user_id is not None:
+        checkpoint = db.get(BalanceCheckpoint, user_id)
+        return checkpoint.archived_until if checkpoint else None
+    return db.execute(select(func.max(BalanceCheckpoint.archived_until))).scalar()
+
+
+def search_transactions(db: Session, **filters):
+    """
+    Returns (transaction, email) rows of all users matching the filters (admin only).
+    Like the user history, the archive is only searched once the page reaches back past the
+    newest archive checkpoint and the date range does not start after it.
+    """
+    hot = db.execute(search_transactions_query(**filters)).all()
+    archived_until = _archived_until(db, filters.get("user_id"))
+    if archived_until is None:
+        return hot
+    limit = filters.get("limit", 50)
+    date_from = filters.get("date_from")
+    if date_from is not None and date_from >= archived_until:
+        return hot
+    if len(hot) == limit and hot[-1][0].timestamp >= archived_until:
+        return hot
+    archived = db.execute(search_transactions_query(**filters, model=ArchivedTransaction)).all()
+    rows = sorted(hot + archived, key=lambda row: (row[0].timestamp, row[0].id), reverse=True)
+    return rows[:limit]
@@ -0,0 +1,134 @@
+# src/sessions.py
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Optional
+
+from sqlalchemy import delete
+
+from src import database
+from src.models import LoginSession
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_TTL_MINUTES = float(os.getenv("SESSION_TTL_MINUTES", str(12 * 60)))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+
+class SessionBackend(ABC):
+    """Maps a browser session token to the id of the logged-in user."""
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[int]:
+        """Returns the user id for ``token``, or None if not logged in or expired."""
+
+    @abstractmethod
+    def set(self, token: str, user_id: int) -> None:
+        """Logs ``user_id`` in for ``token``."""
+
+    @abstractmethod
+    def delete(self, token: str) -> None:
+        """Logs ``token`` out."""
+
+    def purge_expired(self) -> int:
+        """Removes expired sessions and returns how many were removed."""
+        return 0
+
+
+class MemorySessionBackend(SessionBackend):
+    """Per-process LRU with sliding TTL expiry; lookups are O(1) and never touch the disk."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token: str) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= now:
+                del self._entries[token]
+                return None
+            self._entries[token] = (user_id, now + self.ttl_seconds)
+            self._entries.move_to_end(token)
+            return user_id
+
+    def set(self, token: str, user_id: int) -> None:
+        with self._lock:
+            self._entries[token] = (user_id, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [token for token, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for token in expired:
+                del self._entries[token]
+        return len(expired)
+
+
+class DatabaseSessionBackend(SessionBackend):
+    """
+    Stores sessions in the shared database so several workers can serve the same users.
+    Lookups are a primary-key read; the expiry is only extended once half the TTL is used up.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    def get(self, token: str) -> Optional[int]:
+        now = datetime.utcnow()
+        with database.SessionLocal() as db:
+            session = db.get(LoginSession, token)
+            if session is None:
+                return None
+            if session.expires_at <= now:
+                db.delete(session)
+                db.commit()
+                return None
+            if session.expires_at - now < self.ttl / 2:
+                session.expires_at = now + self.ttl
+                db.commit()
+            return session.user_id
+
+    def set(self, token: str, user_id: int) -> None:
+        with database.SessionLocal() as db:
+            db.merge(LoginSession(token=token, user_id=user_id, expires_at=datetime.utcnow() + self.ttl))
+            db.commit()
+
+    def delete(self, token: str) -> None:
+        with database.SessionLocal() as db:
+            db.execute(delete(LoginSession).where(LoginSession.token == token))
+            db.commit()
+
+    def purge_expired(self) -> int:
+        with database.SessionLocal() as db:
+            result = db.execute(delete(LoginSession).where(LoginSession.expires_at <= datetime.utcnow()))
+            db.commit()
+            return result.rowcount
+
+
+def create_session_backend(kind: str = SESSION_BACKEND) -> SessionBackend:
+    """Creates the backend selected by SESSION_BACKEND (``memory`` or ``database``)."""
+    ttl_seconds = SESSION_TTL_MINUTES * 60
+    if kind == "database":
+        return DatabaseSessionBackend(ttl_seconds)
+    if kind == "memory":
+        return MemorySessionBackend(ttl_seconds, SESSION_CACHE_SIZE)
+    raise ValueError(f"Unknown SESSION_BACKEND {kind!r}")
+
+
+session_backend: SessionBackend = create_session_backend()
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.archive import archive_transactions
+from src.models import (
+    ArchivedTransaction,
+    Base,
+    BalanceCheckpoint,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+)
+import src.services as services
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def add_transaction(db, user_id, amount, days_ago, status=TransactionStatus.CONFIRMED):
+    db.add(Transaction(
+        user_id=user_id,
+        amount=amount,
+        type=TransactionType.PURCHASE if amount < 0 else TransactionType.DEPOSIT,
+        status=status,
+        timestamp=datetime.utcnow() - timedelta(days=days_ago),
+    ))
+    db.commit()
+
+
+def test_archive_moves_old_confirmed_transactions_into_checkpoint(db):
+    add_transaction(db, 1, 20.0, days_ago=400)
+    add_transaction(db, 1, -1.5, days_ago=380)
+    add_transaction(db, 1, 5.0, days_ago=390, status=TransactionStatus.PENDING)
+    add_transaction(db, 1, -2.0, days_ago=3)
+
+    assert archive_transactions(db, timedelta(days=365)) == 2
+
+    assert db.query(Transaction).count() == 2
+    assert db.query(ArchivedTransaction).count() == 2
+    checkpoint = db.get(BalanceCheckpoint, 1)
+    assert checkpoint.archived_amount == pytest.approx(18.5)
+    assert checkpoint.archived_count == 2
+    # Running again finds nothing new
+    assert archive_transactions(db, timedelta(days=365)) == 0
+
+
+def test_archive_again_after_the_hot_table_was_emptied(db):
+    add_transaction(db, 1, 20.0, days_ago=400)
+    add_transaction(db, 1, -1.5, days_ago=380)
+    assert archive_transactions(db, timedelta(days=365)) == 2
+
+    # a new row must not get an id that already lives in the archive
+    add_transaction(db, 1, -2.0, days_ago=370)
+    assert db.query(Transaction).one().id == 3
+    assert archive_transactions(db, timedelta(days=365)) == 1
+    assert db.query(ArchivedTransaction).count() == 3
+    assert db.get(BalanceCheckpoint, 1).archived_count == 3
+
+
+def test_history_reads_across_hot_table_and_archive(db):
+    for day in range(10):
+        add_transaction(db, 1, -1.0, days_ago=day * 100)
+    archive_transactions(db, timedelta(days=365))
+
+    first = services.get_transaction_history(db, 1, limit=4)
+    second = services.get_transaction_history(
+        db, 1, before=(first[-1].timestamp, first[-1].id), limit=4
+    )
+    third = services.get_transaction_history(
+        db, 1, before=(second[-1].timestamp, second[-1].id), limit=4
+    )
+    rows = first + second + third
+    assert len(rows) == 10
+    assert [t.timestamp for t in rows] == sorted((t.timestamp for t in rows), reverse=True)
+    assert any(isinstance(t, ArchivedTransaction) for t in second)
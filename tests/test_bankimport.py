@@ -0,0 +1,169 @@
+import logging
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.bankimport import (
+    PendingDeposit,
+    StatementLine,
+    decode_statement,
+    find_reference,
+    import_bank_statement,
+    match_deposits,
+    parse_amount,
+    parse_statement,
+)
+from src.models import Base, TransactionStatus, TransactionType
+import src.services as services
+
+STATEMENT = '''Kontonummer;DE12 3456 7890 1234 5678 90
+Zeitraum;01.03.2025 - 31.03.2025
+
+Buchungstag;Valuta;Name;Verwendungszweck;Betrag
+03.03.2025;03.03.2025;Alice Example;Matekasse MK-ABC234;20,00
+04.03.2025;04.03.2025;Bob;Getränke;10,00
+05.03.2025;05.03.2025;Miete GmbH;Miete März;-1.250,00
+kaputt;;;;
+'''
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def line(number, cents, purpose='', name='', booked=date(2025, 3, 3)):
+    return StatementLine(number, booked, cents, purpose, name)
+
+
+def deposit(id, cents, reference=None, email='user@matekasse.de', booked=date(2025, 3, 2)):
+    return PendingDeposit(id, id, email, cents, booked, reference)
+
+
+def test_parse_german_statement():
+    lines = parse_statement(decode_statement(STATEMENT.encode('cp1252')))
+    assert [(l.line, l.booked, l.cents, l.name) for l in lines] == [
+        (5, date(2025, 3, 3), 2000, 'Alice Example'),
+        (6, date(2025, 3, 4), 1000, 'Bob'),
+        (7, date(2025, 3, 5), -125000, 'Miete GmbH'),
+    ]
+    assert lines[1].purpose == 'Getränke'
+    assert parse_amount('1.234,56 €') == 123456
+    assert find_reference('matekasse mk abc234 danke') == 'MK-ABC234'
+
+
+def test_match_by_reference_then_unique_amount():
+    result = match_deposits(
+        [line(1, 2000, 'MK-ABC234'), line(2, 1000), line(3, 700)],
+        [deposit(1, 2000, 'MK-ABC234'), deposit(2, 2000), deposit(3, 1000)],
+    )
+    assert {d: l.line for d, l in result.matched.items()} == {1: 1, 3: 2}
+    assert [l.line for l in result.unmatched] == [3]
+    assert result.review == []
+
+
+def test_ambiguous_lines_are_left_for_review():
+    result = match_deposits(
+        [
+            line(1, 500),
+            line(2, 1500, 'MK-ZZZ999'),
+            line(3, 2500, 'MK-ABC234'),
+            line(4, 3000),
+            line(5, 3000),
+            line(6, 4000, booked=date(2025, 4, 30)),
+        ],
+        [
+            deposit(1, 500, email='alice@matekasse.de'),
+            deposit(2, 500, email='bob@matekasse.de'),
+            deposit(3, 2000, 'MK-ABC234'),
+            deposit(4, 3000),
+            deposit(5, 4000),
+        ],
+        tolerance_days=7,
+    )
+    assert result.matched == {}
+    assert [(item.line.line, item.reason) for item in result.review] == [
+        (1, 'Several deposits with this amount'),
+        (2, 'Unknown reference MK-ZZZ999'),
+        (3, 'Amount differs from the deposit'),
+        (4, 'Several lines match one deposit'),
+        (5, 'Several lines match one deposit'),
+    ]
+    # outside the date window there is no candidate at all
+    assert [l.line for l in result.unmatched] == [6]
+
+
+def test_payer_name_narrows_equal_amounts():
+    result = match_deposits(
+        [line(1, 500, name='Alice Example')],
+        [deposit(1, 500, email='alice@matekasse.de'), deposit(2, 500, email='bob@matekasse.de')],
+    )
+    assert list(result.matched) == [1]
+
+
+def test_import_confirms_matches_in_one_batch(db):
+    alice = services.create_user(db, 'alice@matekasse.de', 'pw')
+    bob = services.create_user(db, 'bob@matekasse.de', 'pw')
+    first = services.create_transaction(db, alice.id, 20.0, TransactionType.DEPOSIT, TransactionStatus.PENDING)
+    second = services.create_transaction(db, bob.id, 10.0, TransactionType.DEPOSIT, TransactionStatus.PENDING)
+    services.create_transaction(db, bob.id, 10.0, TransactionType.DEPOSIT, TransactionStatus.PENDING)
+    assert first.reference.startswith('MK-') and first.reference != second.reference
+    today = datetime.utcnow().strftime('%d.%m.%Y')
+    statement = (
+        'Buchungstag;Betrag;Verwendungszweck\n'
+        f'{today};20,00;Einzahlung {first.reference}\n'
+        f'{today};10,00;Einzahlung\n'
+    )
+
+    result = import_bank_statement(db, statement)
+
+    assert result.confirmed == 1
+    assert [item.candidates for item in result.review] == [[second.id, second.id + 1]]
+    db.refresh(alice)
+    db.refresh(first)
+    assert alice.balance == 20.0 and first.status == TransactionStatus.CONFIRMED
+    # importing the same statement again confirms nothing twice
+    assert import_bank_statement(db, statement).confirmed == 0
+
+
+def test_confirm_deposits_batches_statements_and_audits_running_balances(db, caplog):
+    users = [services.create_user(db, f'user{n}@matekasse.de', 'pw') for n in range(4)]
+    deposits = [
+        services.create_transaction(db, users[n % 4].id, 1.0, TransactionType.DEPOSIT, TransactionStatus.PENDING).id
+        for n in range(200)
+    ]
+    statements = []
+    event.listen(db.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    with caplog.at_level(logging.INFO, logger='matekasse.audit'):
+        assert services.confirm_deposits(db, deposits, source='bank_import') == 200
+
+    # selects, one batched update per table and the commit; nothing reloaded for the audit
+    assert len(statements) <= 5
+    balances = [record.balance for record in caplog.records if record.user_id == users[0].id]
+    assert balances == [float(n) for n in range(1, 51)]
+
+
+def test_shared_reference_is_left_for_review():
+    result = match_deposits(
+        [line(1, 2000, 'MK-ABC234')],
+        [deposit(1, 2000, 'MK-ABC234'), deposit(2, 2000, 'MK-ABC234')],
+    )
+    assert result.matched == {}
+    assert [(item.reason, item.candidates) for item in result.review] == [
+        ('Several deposits with this reference', [1, 2])
+    ]
+
+
+def test_new_deposits_never_share_a_pending_reference(db, monkeypatch):
+    user = services.create_user(db, 'alice@matekasse.de', 'pw')
+    codes = iter(['MK-AAAAAA', 'MK-AAAAAA', 'MK-BBBBBB'])
+    monkeypatch.setattr(services, 'new_reference', lambda: next(codes))
+    first = services.create_transaction(db, user.id, 5.0, TransactionType.DEPOSIT, TransactionStatus.PENDING)
+    second = services.create_transaction(db, user.id, 5.0, TransactionType.DEPOSIT, TransactionStatus.PENDING)
+    assert (first.reference, second.reference) == ('MK-AAAAAA', 'MK-BBBBBB')
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from src.datagen import generate
+from src.models import Transaction, TransactionStatus, User
+
+NOW = datetime(2025, 3, 1, 12, 0)
+
+
+def generated_rows(seed):
+    engine = create_engine('sqlite:///:memory:')
+    counts = generate(engine, users=20, transactions=500, days=30, seed=seed, now=NOW)
+    with Session(engine) as db:
+        transactions = db.execute(
+            select(
+                Transaction.user_id,
+                Transaction.amount,
+                Transaction.type,
+                Transaction.status,
+                Transaction.timestamp,
+                Transaction.beverage_id,
+            ).order_by(Transaction.id)
+        ).all()
+        balances = dict(db.execute(select(User.id, User.balance)).all())
+        booked = dict(db.execute(
+            select(Transaction.user_id, func.sum(Transaction.amount))
+            .where(Transaction.status == TransactionStatus.CONFIRMED)
+            .group_by(Transaction.user_id)
+        ).all())
+    return counts, transactions, balances, booked
+
+
+def test_generate_is_reproducible_and_balances_match_history():
+    counts, transactions, balances, booked = generated_rows(seed=7)
+
+    assert counts == {'users': 20, 'beverages': 8, 'transactions': 500}
+    assert generated_rows(seed=7)[1:3] == (transactions, balances)
+    assert generated_rows(seed=8)[1] != transactions
+    for user_id, total in booked.items():
+        assert balances[user_id] == round(total, 2)
+    timestamps = [row.timestamp for row in transactions]
+    assert timestamps == sorted(timestamps)
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.forecast import forecast_stock
+from src.models import Base, Beverage, Transaction, TransactionStatus, TransactionType
+
+NOW = datetime(2025, 3, 3, 12, 0)
+
+
+def buy(db, beverage_id, days_ago, count=1):
+    db.add_all(
+        Transaction(
+            user_id=1,
+            amount=-1.0,
+            type=TransactionType.PURCHASE,
+            status=TransactionStatus.CONFIRMED,
+            beverage_id=beverage_id,
+            timestamp=NOW - timedelta(days=days_ago),
+        )
+        for _ in range(count)
+    )
+    db.commit()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        session.add_all([Beverage(id=1, name='Mate', price=1.5, stock=40), Beverage(id=2, name='Cola', price=1.2, stock=5)])
+        session.commit()
+        yield session
+
+
+def test_steady_consumption_gives_rate_days_left_and_reorder(db):
+    for day in range(1, 29):
+        buy(db, 1, day, count=4)
+
+    forecast = forecast_stock(db, now=NOW)
+
+    assert forecast[1].daily_rate == pytest.approx(4.0)
+    assert forecast[1].days_until_empty == pytest.approx(10.0)
+    # (3 days lead time + 14 days cover) * 4 per day - 40 in stock
+    assert forecast[1].reorder_quantity == 28
+    assert forecast[2].days_until_empty is None and forecast[2].reorder_quantity == 0
+
+
+def test_forecast_picks_up_new_purchases_incrementally(db):
+    buy(db, 2, 1, count=10)
+    first = forecast_stock(db, now=NOW)[2].daily_rate
+    buy(db, 2, 2, count=10)
+    second = forecast_stock(db, now=NOW)[2].daily_rate
+    assert second > first > 0
+    # purchases outside the window are ignored, and the window moves with time
+    later = forecast_stock(db, now=NOW + timedelta(days=60))
+    assert later[2].daily_rate == 0
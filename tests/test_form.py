@@ -0,0 +1,55 @@
+from nicegui import ui
+from nicegui.events import GenericEventArguments
+from nicegui.testing import User
+
+from src.components.form import email, form, max_value, min_value, numeric, required
+
+pytest_plugins = ['nicegui.testing.user_plugin']
+
+
+def test_rules_check_values_like_the_browser():
+    assert not required().check('  ')
+    assert required().check('x')
+    # only `required` rejects empty values
+    for rule in (numeric(), min_value(1), max_value(5), email()):
+        assert rule.check('')
+    assert numeric().check('1.5') and not numeric().check('abc')
+    assert min_value(1).check('1') and not min_value(1).check('0.5')
+    assert max_value(5).check('5') and not max_value(5).check('5.5')
+    assert email().check('a@b.de') and not email().check('a@b')
+
+
+async def test_fields_are_registered_once_and_sent_on_submit(user: User):
+    submitted = []
+
+    @ui.page('/form')
+    def page():
+        with form(on_submit=lambda **values: submitted.append(values), rules={'amount': [required(), numeric()]}) as f:
+            ui.input('Name').props('key=name')
+            amount = ui.input('Amount').props('key=amount')
+            f.create_submit_button('Save')
+        page.form = f
+        page.amount = amount
+
+    await user.open('/form')
+    f = page.form
+    assert set(f.elements) == {'name', 'amount'}
+    assert 'v => ' in page.amount.props[':rules']
+    # typing in the browser does not send an update per keystroke
+    listeners = [l for l in page.amount._event_listeners.values() if l.type == 'update:value']
+    assert listeners and all(not l.leading_events and not l.trailing_events for l in listeners)
+
+    user.find('Save').click()
+    await user.should_see('Required')
+    assert submitted == []
+
+    user.find('Amount').type('2.5')
+    user.find('Save').click()
+    assert submitted == [{'name': '', 'amount': '2.5'}]
+
+    # the browser sends all deferred values in the submit event
+    f._handle_submit_event(GenericEventArguments(
+        sender=f.submit_button, client=f.client, args={'values': {'name': 'Bob', 'amount': '3'}}
+    ))
+    assert submitted[-1] == {'name': 'Bob', 'amount': '3'}
+    assert page.amount.value == '3'
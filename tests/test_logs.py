@@ -0,0 +1,63 @@
+import json
+import logging
+
+import src.logs as logs
+import src.services as services
+from src.database import EngineCache
+from src.logs import BoundedQueueHandler, JsonFormatter, TenantFilter
+from src.models import Base
+
+
+def test_full_queue_drops_records_and_counts_them():
+    handler = BoundedQueueHandler(maxsize=2)
+    logger = logging.getLogger('matekasse.test_drop')
+    logger.addHandler(handler)
+    logger.propagate = False
+    for i in range(5):
+        logger.warning('message %s', i)
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.makeLogRecord({
+        'name': 'matekasse', 'levelname': 'INFO', 'msg': 'Login success for %s',
+        'args': ('a@b.de',), 'user_id': 7, 'page': '/login', 'action': 'login', 'duration_ms': 1.5,
+    })
+    data = json.loads(JsonFormatter().format(record))
+    assert data['message'] == 'Login success for a@b.de'
+    assert (data['user_id'], data['page'], data['action'], data['duration_ms']) == (7, '/login', 'login', 1.5)
+
+
+def test_audit_records_name_the_tenant_of_the_session(tmp_path, caplog):
+    cache = EngineCache(f'sqlite:///{tmp_path}/{{tenant}}.db', max_engines=2)
+    cache.on_open = Base.metadata.create_all
+    with cache.sessionmaker('kitchen')() as db, caplog.at_level(logging.INFO, logger='matekasse.audit'):
+        user = services.create_user(db, 'a@b.de', 'pw')
+        services.update_user_balance(db, user.id, 5.0)
+    assert [record.tenant for record in caplog.records if record.name == 'matekasse.audit'] == ['kitchen']
+    cache.evict_idle(0)
+
+
+def test_tenant_filter_fills_in_the_page_tenant(monkeypatch):
+    monkeypatch.setattr(logs, '_tenant_resolver', lambda: 'floor2')
+    record = logging.makeLogRecord({'msg': 'Login'})
+    explicit = logging.makeLogRecord({'msg': 'Audit', 'tenant': 'kitchen'})
+    assert TenantFilter().filter(record) and TenantFilter().filter(explicit)
+    assert (record.tenant, explicit.tenant) == ('floor2', 'kitchen')
+
+
+def test_exceptions_keep_their_own_field_through_the_queue():
+    handler = BoundedQueueHandler(maxsize=10)
+    logger = logging.getLogger('matekasse.test_exception')
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception('Failed for user %s', 7, extra={'user_id': 7})
+
+    data = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert data['message'] == 'Failed for user 7'
+    assert data['user_id'] == 7
+    assert 'ZeroDivisionError' in data['exception']
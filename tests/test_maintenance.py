@@ -0,0 +1,95 @@
+import asyncio
+import sqlite3
+
+from sqlalchemy import create_engine, text
+
+from src.maintenance import (
+    Scheduler,
+    backup_database,
+    checkpoint_wal,
+    enable_incremental_vacuum,
+    incremental_vacuum,
+)
+from src.database import configure_sqlite
+
+
+def make_engine(path):
+    engine = create_engine(f'sqlite:///{path}', connect_args={"check_same_thread": False})
+    configure_sqlite(engine)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE drinks (name TEXT)'))
+        conn.execute(text("INSERT INTO drinks VALUES ('Mate'), ('Cola')"))
+    return engine
+
+
+def test_backup_copies_database_and_applies_retention(tmp_path):
+    engine = make_engine(tmp_path / 'kasse.db')
+    backup_dir = tmp_path / 'backups'
+    backup_dir.mkdir()
+    for stamp in ('20200101-000000', '20200102-000000'):
+        (backup_dir / f'kasse-{stamp}.db').write_bytes(b'')
+        # backups of another tenant whose name starts with "kasse-"
+        (backup_dir / f'kasse-2-{stamp}.db').write_bytes(b'')
+
+    target = backup_database(engine, str(backup_dir), retention=2, pages_per_step=1, step_sleep=0)
+
+    with sqlite3.connect(target) as copy:
+        assert copy.execute('SELECT count(*) FROM drinks').fetchone() == (2,)
+    assert sorted(p.name for p in backup_dir.iterdir()) == [
+        'kasse-2-20200101-000000.db',
+        'kasse-2-20200102-000000.db',
+        'kasse-20200102-000000.db',
+        target.name,
+    ]
+
+
+def test_maintenance_pragmas_run_on_wal_database(tmp_path):
+    engine = make_engine(tmp_path / 'kasse.db')
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+    checkpoint_wal(engine)
+    incremental_vacuum(engine)
+
+
+def test_incremental_vacuum_leaves_conversion_to_the_command(tmp_path):
+    path = tmp_path / 'kasse.db'
+    with sqlite3.connect(path) as legacy:
+        legacy.execute('CREATE TABLE drinks (name TEXT)')
+    engine = create_engine(f'sqlite:///{path}')
+    configure_sqlite(engine)
+
+    # the scheduled job never runs a blocking full VACUUM
+    incremental_vacuum(engine)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 0
+
+    assert enable_incremental_vacuum(engine)
+    assert not enable_incremental_vacuum(engine)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+
+
+async def test_scheduler_records_run_times_and_errors():
+    scheduler = Scheduler()
+    ok = scheduler.add_job('ok', 60, lambda: None)
+    broken = scheduler.add_job('broken', 60, lambda: 1 / 0)
+
+    await scheduler.run_job(ok)
+    await scheduler.run_job(broken)
+
+    status = scheduler.status()
+    assert status['ok']['runs'] == 1 and status['ok']['last_error'] is None
+    assert status['broken']['failures'] == 1 and 'ZeroDivisionError' in status['broken']['last_error']
+
+
+async def test_scheduler_awaits_coroutine_jobs_on_the_event_loop():
+    scheduler = Scheduler()
+    loops = []
+
+    async def on_loop():
+        loops.append(asyncio.get_running_loop())
+
+    await scheduler.run_job(scheduler.add_job('on_loop', 60, on_loop))
+    assert loops == [asyncio.get_running_loop()]
+    assert scheduler.status()['on_loop']['runs'] == 1
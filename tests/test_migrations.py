@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, inspect
+
+from src.migrations import MIGRATIONS, migrate
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Import of src.main plus the schema check on an up-to-date database
+STARTUP_BUDGET_SECONDS = 5.0
+
+LEGACY_SCHEMA = [
+    'CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR, hashed_password VARCHAR, balance FLOAT, '
+    'is_admin BOOLEAN, is_active BOOLEAN, created_at DATETIME)',
+    'CREATE TABLE beverages (id INTEGER PRIMARY KEY, name VARCHAR UNIQUE, price FLOAT, stock INTEGER)',
+    'CREATE TABLE transactions (id INTEGER PRIMARY KEY, user_id INTEGER, amount FLOAT, type VARCHAR(8), '
+    'status VARCHAR(9), timestamp DATETIME)',
+    'CREATE INDEX ix_transactions_id ON transactions (id)',
+    'CREATE INDEX ix_transactions_user_id ON transactions (user_id)',
+]
+
+
+def test_migrate_creates_schema_once():
+    engine = create_engine('sqlite:///:memory:')
+    assert migrate(engine) == len(MIGRATIONS)
+    assert migrate(engine) == 0
+    assert {'users', 'transactions', 'transactions_archive', 'schema_version'} <= set(inspect(engine).get_table_names())
+
+
+def test_migrate_upgrades_unversioned_database(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql("INSERT INTO transactions (user_id, amount, type, status) VALUES (1, 5, 'DEPOSIT', 'CONFIRMED')")
+
+    assert migrate(engine) == len(MIGRATIONS)
+    inspector = inspect(engine)
+    assert {'beverage_id', 'reference'} <= {column['name'] for column in inspector.get_columns('transactions')}
+    indexes = {index['name'] for index in inspector.get_indexes('transactions')}
+    assert 'ix_transactions_user_timestamp' in indexes
+    assert not indexes & {'ix_transactions_id', 'ix_transactions_user_id'}
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT count(*) FROM transactions').scalar() == 1
+
+
+def test_migrate_stops_reusing_archived_transaction_ids(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.exec_driver_sql(statement)
+    # databases archived before AUTOINCREMENT may already hold a reused id
+    for migration in MIGRATIONS[:4]:
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO transactions_archive (id, user_id, amount) VALUES (1, 1, 5), (2, 1, 5)")
+        conn.exec_driver_sql("INSERT INTO transactions (id, user_id, amount) VALUES (1, 1, 3)")
+
+    migrate(engine)
+
+    with engine.begin() as conn:
+        assert conn.exec_driver_sql('SELECT id FROM transactions').scalars().all() == [3]
+        conn.exec_driver_sql('DELETE FROM transactions')
+        conn.exec_driver_sql('INSERT INTO transactions (user_id, amount) VALUES (1, 1)')
+        assert conn.exec_driver_sql('SELECT id FROM transactions').scalar() == 4
+    assert 'ix_transactions_user_timestamp' in {index['name'] for index in inspect(engine).get_indexes('transactions')}
+
+
+def test_startup_stays_within_budget(tmp_path):
+    script = '''
+import json, sys, time
+started = time.perf_counter()
+import src.main as main
+from sqlalchemy import event
+imported = time.perf_counter() - started
+main.prepare_database(main.engine)
+statements = []
+event.listen(main.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+prepare_started = time.perf_counter()
+main.prepare_database(main.engine)
+prepared = time.perf_counter() - prepare_started
+print(json.dumps({"imported": imported, "prepared": prepared, "statements": statements,
+                  "numpy": "numpy" in sys.modules}))
+'''
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{tmp_path / "startup.db"}', 'PYTHONPATH': ROOT}
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    # admin-only code (forecast, numpy) is imported on first use
+    assert not measured['numpy']
+    # an up-to-date database needs no DDL and no reflection
+    assert not [s for s in measured['statements'] if s.lstrip().upper().startswith(('CREATE', 'ALTER', 'DROP'))]
+    assert len(measured['statements']) <= 4
+    assert measured['imported'] + measured['prepared'] < STARTUP_BUDGET_SECONDS
+
+
+def test_applied_migrations_do_not_follow_later_model_changes(tmp_path):
+    # a column added to the model after version 5 must not break upgrading older databases
+    script = f'''
+from sqlalchemy import Column, String, create_engine
+from src.models import Transaction
+from src.migrations import migrate
+Transaction.__table__.append_column(Column("note", String))
+engine = create_engine("sqlite:///{tmp_path / "legacy.db"}")
+with engine.begin() as conn:
+    for statement in {LEGACY_SCHEMA!r}:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO transactions (user_id, amount) VALUES (1, 5)")
+print(migrate(engine))
+'''
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip().splitlines()[-1] == str(len(MIGRATIONS))
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.archive import archive_transactions
+from src.models import Base, Transaction, TransactionStatus, TransactionType
+from src.projections import (
+    list_beverage_rows,
+    list_user_rows,
+    pending_transaction_rows,
+    transaction_history_rows,
+)
+import src.services as services
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def test_rows_are_formatted_and_not_tracked(db):
+    user = services.create_user(db, 'a@matekasse.de', 'pw')
+    services.update_user_balance(db, user.id, 3.5)
+    services.create_beverage(db, 'Mate', 1.5, 4)
+    services.create_transaction(db, user.id, 10.0, TransactionType.DEPOSIT, TransactionStatus.PENDING)
+    db.expunge_all()
+
+    [user_row] = list_user_rows(db)
+    assert (user_row.email, user_row.balance_text, user_row.is_admin) == ('a@matekasse.de', '3.50 €', False)
+    [beverage_row] = list_beverage_rows(db)
+    assert (beverage_row.name, beverage_row.price_text, beverage_row.stock) == ('Mate', '1.50 €', 4)
+    [pending] = pending_transaction_rows(db)
+    assert pending.amount_text == '10.00' and pending.date_text == pending.timestamp.strftime('%Y-%m-%d %H:%M')
+    # only plain tuples were loaded, nothing entered the identity map
+    assert len(db.identity_map) == 0
+
+
+def test_history_rows_match_orm_history(db):
+    for day in range(10):
+        db.add(Transaction(
+            user_id=1,
+            amount=-1.0,
+            type=TransactionType.PURCHASE,
+            status=TransactionStatus.CONFIRMED,
+            timestamp=datetime.utcnow() - timedelta(days=day * 100),
+        ))
+    db.commit()
+    archive_transactions(db, timedelta(days=365))
+
+    cursor = None
+    for _ in range(3):
+        rows = transaction_history_rows(db, 1, before=cursor, limit=4)
+        assert [t.id for t in rows] == [t.id for t in services.get_transaction_history(db, 1, before=cursor, limit=4)]
+        cursor = (rows[-1].timestamp, rows[-1].id)
+
+
+def test_purchase_rechecks_balance_and_stock(db):
+    user = services.create_user(db, 'a@matekasse.de', 'pw')
+    services.update_user_balance(db, user.id, 2.0)
+    beverage = services.create_beverage(db, 'Mate', 1.5, 1)
+
+    services.purchase_beverage(db, user.id, beverage.id)
+    assert (user.balance, beverage.stock) == (0.5, 0)
+    with pytest.raises(HTTPException, match='Not enough balance'):
+        services.purchase_beverage(db, user.id, beverage.id)
+    services.update_user_balance(db, user.id, 5.0)
+    with pytest.raises(HTTPException, match='Out of stock'):
+        services.purchase_beverage(db, user.id, beverage.id)
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.archive import archive_transactions
+from src.models import Base, TransactionStatus, TransactionType
+import src.services as services
+
+
+@pytest.fixture(scope='module')
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def query_plan(engine, **filters):
+    statement = services.search_transactions_query(**filters)
+    sql = str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+@pytest.mark.parametrize('filters, index', [
+    ({'user_id': 3}, 'ix_transactions_user_timestamp'),
+    ({'user_id': 3, 'before': (datetime(2024, 1, 1), 10)}, 'ix_transactions_user_timestamp'),
+    ({'email_prefix': 'ali'}, 'ix_users_email'),
+    ({'email_prefix': 'ali'}, 'ix_transactions_user_timestamp'),
+    ({'transaction_type': TransactionType.DEPOSIT}, 'ix_transactions_type_timestamp'),
+    ({'status': TransactionStatus.PENDING, 'min_amount': 20}, 'ix_transactions_status_timestamp'),
+    ({'date_from': datetime(2024, 1, 1), 'date_to': datetime(2024, 2, 1)}, 'ix_transactions_timestamp'),
+])
+def test_search_filters_use_indexes(engine, filters, index):
+    plan = query_plan(engine, **filters)
+    assert any(step.startswith('SEARCH') and index in step for step in plan), plan
+    assert not any(step == 'SCAN transactions' for step in plan), plan
+
+
+def test_unfiltered_search_walks_timestamp_index_without_sorting(engine):
+    plan = query_plan(engine)
+    assert 'SCAN transactions USING INDEX ix_transactions_timestamp' in plan
+    assert not any('TEMP B-TREE' in step for step in plan), plan
+
+
+def test_search_filters_and_paginates(engine):
+    with Session(engine) as db:
+        alice = services.create_user(db, 'alice@example.com', 'pw')
+        bob = services.create_user(db, 'bob@example.com', 'pw')
+        for amount in (5.0, 10.0, 20.0):
+            services.create_transaction(db, alice.id, amount, TransactionType.DEPOSIT, TransactionStatus.CONFIRMED)
+        services.create_transaction(db, bob.id, -1.5, TransactionType.PURCHASE, TransactionStatus.CONFIRMED)
+
+        found = services.search_transactions(db, email_prefix='al', min_amount=6)
+        assert sorted(t.amount for t, _ in found) == [10.0, 20.0]
+        assert {email for _, email in found} == {'alice@example.com'}
+
+        first = services.search_transactions(db, limit=3)
+        last = first[-1][0]
+        rest = services.search_transactions(db, limit=3, before=(last.timestamp, last.id))
+        assert len(first) == 3 and len(rest) == 1
+        assert {t.id for t, _ in first}.isdisjoint(t.id for t, _ in rest)
+
+
+def test_search_reaches_into_the_archive():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        alice = services.create_user(db, 'alice@example.com', 'pw')
+        old = services.create_transaction(db, alice.id, 5.0, TransactionType.DEPOSIT, TransactionStatus.CONFIRMED)
+        old.timestamp = datetime.utcnow() - timedelta(days=400)
+        db.commit()
+        old_id = old.id
+        archive_transactions(db, timedelta(days=365))
+        recent = services.create_transaction(db, alice.id, -1.5, TransactionType.PURCHASE, TransactionStatus.CONFIRMED)
+
+        # a disputed charge from last year is still found by the admin ledger
+        found = services.search_transactions(db, user_id=alice.id)
+        assert [(t.id, type(t).__name__) for t, _ in found] == [
+            (recent.id, 'Transaction'), (old_id, 'ArchivedTransaction')
+        ]
+        first = services.search_transactions(db, email_prefix='ali', limit=1)
+        cursor = (first[0][0].timestamp, first[0][0].id)
+        assert [t.id for t, _ in services.search_transactions(db, limit=1, before=cursor)] == [old_id]
+        # ranges after the archive cutoff do not touch the archive
+        assert services.search_transactions(db, date_from=datetime.utcnow() - timedelta(days=30)) == found[:1]
@@ -0,0 +1,35 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.database as database
+from src.models import Base
+from src.sessions import DatabaseSessionBackend, MemorySessionBackend
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemorySessionBackend(ttl_seconds=60, max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    assert backend.get('a') == 1
+    backend.set('c', 3)
+    assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+
+
+def test_memory_backend_expires_sessions():
+    backend = MemorySessionBackend(ttl_seconds=0, max_entries=10)
+    backend.set('a', 1)
+    assert backend.get('a') is None
+    backend.set('b', 2)
+    assert backend.purge_expired() == 1
+
+
+def test_database_backend_is_shared_between_instances(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, 'SessionLocal', sessionmaker(bind=engine))
+    worker_a, worker_b = DatabaseSessionBackend(60), DatabaseSessionBackend(60)
+    worker_a.set('token', 5)
+    assert worker_b.get('token') == 5
+    worker_b.delete('token')
+    assert worker_a.get('token') is None
+    assert DatabaseSessionBackend(0).purge_expired() == 0
@@ -0,0 +1,30 @@
+from sqlalchemy.orm import sessionmaker
+
+from src.database import _create_engine, statement_cache
+from src.migrations import migrate
+import src.services as services
+
+
+def test_hot_lookups_reuse_compiled_statements():
+    engine = _create_engine('sqlite:///:memory:')
+    migrate(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        user_id = services.create_user(db, 'a@matekasse.de', 'pw').id
+        beverage_id = services.create_beverage(db, 'Mate', 1.5, 3).id
+
+    for email in ('a@matekasse.de', 'b@matekasse.de'):
+        with factory() as db:
+            services.get_user_by_email(db, email)
+            services.get_user(db, user_id)
+            services.update_beverage(db, beverage_id, stock=2)
+    before = statement_cache.stats()
+    with factory() as db:
+        assert services.get_user_by_email(db, 'a@matekasse.de').id == user_id
+        services.get_user(db, user_id)
+        services.update_beverage(db, beverage_id, stock=1)
+    after = statement_cache.stats()
+
+    assert after['misses'] == before['misses']
+    assert after['hits'] > before['hits']
+    assert 0 < after['hit_ratio'] <= 1
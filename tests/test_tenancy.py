@@ -0,0 +1,111 @@
+import asyncio
+import gc
+import time
+
+import pytest
+from nicegui import Client
+from nicegui.testing import User
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import src.database as database
+import src.main as main
+import src.services as services
+from src.database import EngineCache
+from src.models import Base
+
+pytest_plugins = ['nicegui.testing.user_plugin']
+
+
+def test_engine_cache_is_lru_bounded_and_evicts_idle_engines(tmp_path):
+    cache = EngineCache(f'sqlite:///{tmp_path}/{{tenant}}.db', max_engines=2)
+    opened = []
+    cache.on_open = opened.append
+    first = cache.sessionmaker('a')
+    cache.sessionmaker('b')
+    assert cache.sessionmaker('a') is first
+    cache.sessionmaker('c')
+    assert set(cache.stats()) == {'a', 'c'}
+    assert len(opened) == 3
+    time.sleep(0.01)
+    cache.sessionmaker('c')
+    assert cache.evict_idle(0.005) == ['a']
+    assert cache.get_open('a') is None and cache.get_open('c') is not None
+
+
+def test_engine_cache_keeps_engines_with_live_sessions(tmp_path):
+    cache = EngineCache(f'sqlite:///{tmp_path}/{{tenant}}.db', max_engines=1)
+    db = cache.sessionmaker('a')()
+    db.connection()
+    engine = cache.get_open('a')
+    # neither the LRU nor idle eviction dispose an engine a page still holds a session of
+    cache.sessionmaker('b')
+    assert cache.evict_idle(0) == ['b']
+    db.close()
+    assert cache.evict_idle(0) == []
+    assert cache.sessionmaker('a')().get_bind() is engine
+    del db
+    gc.collect()
+    assert cache.evict_idle(0) == ['a']
+
+
+def test_unknown_tenants_are_rejected():
+    assert database.get_sessionmaker() is database.SessionLocal
+    with pytest.raises(KeyError):
+        database.get_sessionmaker('../etc')
+
+
+@pytest.fixture
+def floor2(tmp_path, monkeypatch):
+    engine = create_engine('sqlite:///:memory:', connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, 'SessionLocal', sessionmaker(bind=engine))
+    monkeypatch.setattr(database, 'engine', engine)
+    monkeypatch.setattr(database, 'TENANTS', ['floor2'])
+    # a fresh cache per test, since open pages of earlier tests may still hold their engines
+    tenant_engines = EngineCache(f'sqlite:///{tmp_path}/{{tenant}}.db', max_engines=2)
+    tenant_engines.on_open = main.prepare_database
+    monkeypatch.setattr(database, 'tenant_engines', tenant_engines)
+    yield
+
+
+@pytest.mark.module_under_test(main)
+async def test_login_is_scoped_to_tenant_from_url(floor2, user: User):
+    with database.get_sessionmaker('floor2')() as db:
+        services.create_user(db, 'floor2@matekasse.de', 'pw', is_admin=False)
+    await user.open('/login?tenant=floor2')
+    await user.should_see('Matekasse · floor2')
+    user.find('E-Mail').type('floor2@matekasse.de')
+    user.find('Password').type('pw')
+    user.find('Login').click()
+    await user.should_see('Welcome, floor2@matekasse.de')
+    # later pages without the query parameter stay on the tenant
+    await user.open('/transactions')
+    await user.should_see('Welcome, floor2@matekasse.de')
+    with database.SessionLocal() as db:
+        assert services.get_user_by_email(db, 'floor2@matekasse.de') is None
+
+
+@pytest.mark.module_under_test(main)
+async def test_evicted_tabs_release_the_tenant_engine(floor2, user: User):
+    with database.get_sessionmaker('floor2')() as db:
+        services.create_user(db, 'floor2@matekasse.de', 'pw', is_admin=False)
+    del db
+    await user.open('/login?tenant=floor2')
+    user.find('E-Mail').type('floor2@matekasse.de')
+    user.find('Password').type('pw')
+    user.find('Login').click()
+    await user.should_see('Buy Beverage')
+    gc.collect()
+    # the open shop tab still holds a session of floor2
+    assert database.tenant_engines.evict_idle(0) == []
+
+    # evict the shop tab; the login page that was left is evicted too and then deleted like after a disconnect
+    for client in list(Client.instances.values()):
+        if not client.shared:
+            main.client_tracker.evict(client)
+            if client is not user.client:
+                client.delete()
+    await asyncio.sleep(0.1)
+    gc.collect()
+    assert database.tenant_engines.evict_idle(0) == ['floor2']
@@ -1,12 +1,18 @@
+import io
 import sys
 import os
+from datetime import datetime
 import pytest
+from fastapi import HTTPException
+from nicegui import ui
 from nicegui.testing import User
+from starlette.datastructures import UploadFile
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.models import Base
 import src.main as main
 import src.services as services
+from src.clients import VISIBILITY_EVENT
 import logging
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
@@ -117,6 +123,25 @@ async def test_deposit(user: User):
     await user.should_see('Deposit recorded')
 
 
+# User story: Negative deposit is rejected by the form rules
+@pytest.mark.module_under_test(main)
+async def test_deposit_rejects_invalid_amount(user: User):
+    with main.SessionLocal() as db:
+        if not services.get_user_by_email(db, 'user@matekasse.de'):
+            services.create_user(db, 'user@matekasse.de', 'user', is_admin=False)
+    await user.open('/login')
+    user.find('E-Mail').type('user@matekasse.de')
+    user.find('Password').type('user')
+    user.find('Login').click()
+    await user.open('/shop')
+    user.find('Amount (€)').type('-3')
+    user.find('Deposit').click()
+    await user.should_see('Must be at least 0.01')
+    with main.SessionLocal() as db:
+        db_user = services.get_user_by_email(db, 'user@matekasse.de')
+        assert services.get_transactions_for_user(db, db_user.id) == []
+
+
 # User story: View transaction history
 @pytest.mark.module_under_test(main)
 async def test_transaction_history(user: User):
@@ -302,3 +327,97 @@ async def test_logout(user: User):
     await user.should_see('Login')
 
 
+
+
+# Admin story: Search all users' transactions
+@pytest.mark.module_under_test(main)
+async def test_admin_ledger_search(user: User):
+    with main.SessionLocal() as db:
+        services.create_user(db, 'admin@matekasse.de', 'admin', is_admin=True)
+        alice = services.create_user(db, 'alice@matekasse.de', 'alice', is_admin=False)
+        bob = services.create_user(db, 'bob@matekasse.de', 'bob', is_admin=False)
+        services.create_transaction(
+            db, alice.id, 12.5, services.TransactionType.DEPOSIT, services.TransactionStatus.PENDING
+        )
+        services.create_transaction(
+            db, bob.id, 7.25, services.TransactionType.DEPOSIT, services.TransactionStatus.PENDING
+        )
+    await user.open('/login')
+    user.find('E-Mail').type('admin@matekasse.de')
+    user.find('Password').type('admin')
+    user.find('Login').click()
+    await user.should_see('Ledger')
+    user.find('Ledger').click()
+    await user.should_see('Search')
+    table = user.find(ui.table).elements.pop()
+    assert {row['user'] for row in table.rows} == {'alice@matekasse.de', 'bob@matekasse.de'}
+    user.find('E-Mail prefix').type('ali')
+    user.find('Search').click()
+    assert [(row['user'], row['amount']) for row in table.rows] == [('alice@matekasse.de', '12.50')]
+
+
+# User story: A forgotten shop tab is released and re-rendered when shown again
+@pytest.mark.module_under_test(main)
+async def test_hidden_tab_is_evicted_and_reloaded(user: User):
+    with main.SessionLocal() as db:
+        services.create_user(db, 'user@matekasse.de', 'user', is_admin=False)
+    await user.open('/login')
+    user.find('E-Mail').type('user@matekasse.de')
+    user.find('Password').type('user')
+    user.find('Login').click()
+    await user.open('/shop')
+    await user.should_see('Buy Beverage')
+    client = user.client
+    listener = next(l for l in client.layout._event_listeners.values() if l.type == VISIBILITY_EVENT)
+
+    def set_visibility(state):
+        client.handle_event({'id': client.layout.id, 'listener_id': listener.id, 'args': [f'"{state}"']})
+
+    set_visibility('hidden')
+    assert main.client_tracker.evict_idle(0) == 1
+    assert not client.content.default_slot.children
+    stats = main.client_tracker.stats()
+    assert stats['evicted'] == 1 and stats['hidden'] == 1
+
+    set_visibility('visible')
+    stats = main.client_tracker.stats()
+    assert stats['evicted'] == 0 and stats['hidden'] == 0
+
+
+# Admin story: Upload a bank statement to confirm deposits by their reference
+@pytest.mark.module_under_test(main)
+async def test_admin_bank_statement_import(user: User):
+    with main.SessionLocal() as db:
+        services.create_user(db, 'admin@matekasse.de', 'admin', is_admin=True)
+        alice = services.create_user(db, 'alice@matekasse.de', 'alice', is_admin=False)
+        deposit = services.create_transaction(
+            db, alice.id, 12.5, services.TransactionType.DEPOSIT, services.TransactionStatus.PENDING
+        )
+        alice_id, reference = alice.id, deposit.reference
+    await user.open('/login')
+    user.find('E-Mail').type('admin@matekasse.de')
+    user.find('Password').type('admin')
+    user.find('Login').click()
+    await user.should_see('Admin')
+    user.find('Admin').click()
+    await user.should_see(reference)
+    today = datetime.utcnow().strftime('%d.%m.%Y')
+    statement = f'Buchungstag;Betrag;Verwendungszweck\n{today};12,50;{reference}\n{today};3,00;Spende\n'
+    upload = user.find(ui.upload).elements.pop()
+    upload.handle_uploads([UploadFile(io.BytesIO(statement.encode()), filename='umsatz.csv')])
+    await user.should_see('1 deposits confirmed, 0 to review, 1 without deposit')
+    await user.should_not_see(reference)
+    with main.SessionLocal() as db:
+        assert services.get_user(db, alice_id).balance == 12.5
+
+
+def test_status_requires_the_status_token(monkeypatch):
+    monkeypatch.setattr(main, 'STATUS_TOKEN', '')
+    with pytest.raises(HTTPException) as disabled:
+        main.status('anything')
+    assert disabled.value.status_code == 404
+    monkeypatch.setattr(main, 'STATUS_TOKEN', 's3cret')
+    with pytest.raises(HTTPException) as rejected:
+        main.status(None)
+    assert rejected.value.status_code == 401
+    assert 'jobs' in main.status('s3cret')